@@ -0,0 +1,62 @@
+class Serializer:
+    '''Turns objects into dicts holding the requested fields only.
+
+    fields is a comma separated list of names, as in ?fields=id,text;
+    unknown names are ignored and an empty list means every field.
+    '''
+
+    fields = {}
+
+    def __init__(self, fields=None):
+        names = [name for name in (fields or '').split(',')
+                 if name in self.fields]
+        self.names = names or list(self.fields)
+
+    def __call__(self, obj):
+        return {name: self.fields[name](obj) for name in self.names}
+
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+class PostSerializer(Serializer):
+    fields = {
+        'id': lambda post: post.pk,
+        'text': lambda post: post.text,
+        'author': lambda post: post.author.username,
+        'group': lambda post: post.group.slug if post.group_id else None,
+        'image': lambda post: post.image.url if post.image else None,
+        'pub_date': lambda post: isoformat(post.pub_date),
+        'updated': lambda post: isoformat(post.updated),
+        'comment_count': lambda post: post.comment_count,
+        'views': lambda post: post.counter,
+    }
+
+
+class CommentSerializer(Serializer):
+    fields = {
+        'id': lambda comment: comment.pk,
+        'post': lambda comment: comment.post_id,
+        'parent': lambda comment: (
+            comment.path[-2] if len(comment.path) > 1 else None),
+        'author': lambda comment: comment.author.username,
+        'text': lambda comment: comment.text,
+        'created': lambda comment: isoformat(comment.created),
+        'updated': lambda comment: isoformat(comment.updated),
+    }
+
+
+class GroupSerializer(Serializer):
+    fields = {
+        'slug': lambda group: group.slug,
+        'title': lambda group: group.title,
+        'description': lambda group: group.description,
+    }
+
+
+class FollowSerializer(Serializer):
+    fields = {
+        'user': lambda follow: follow.user.username,
+        'author': lambda follow: follow.author.username,
+    }
@@ -0,0 +1,142 @@
+import base64
+import json
+
+from django.test import Client
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.services import create_comment
+from posts.tests.base import PostsTestCase
+
+
+def basic_auth(username, password):
+    credentials = base64.b64encode(f'{username}:{password}'.encode())
+    return {'HTTP_AUTHORIZATION': f'Basic {credentials.decode()}'}
+
+
+class ApiTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Api', email='api@gmail.com', password='secret-pass',
+            is_active=True)
+        cls.reader = User.objects.create(
+            username='Mobile', email='mobile@gmail.com', is_active=True)
+        cls.group = Group.objects.create(
+            title='Apps', slug='apps', description='Mobile apps')
+        for num in range(25):
+            Post.objects.create(text=f'Post {num}', author=cls.author,
+                                group=cls.group if num % 2 else None)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.guest = Client()
+        self.client = Client()
+        self.client.force_login(ApiTest.reader)
+
+    def test_posts_are_cursor_paginated(self):
+        response = self.guest.get(reverse('api:posts'), {'limit': 10})
+        first = response.json()
+        self.assertEqual(len(first['results']), 10)
+        self.assertEqual(first['results'][0]['text'], 'Post 24')
+        self.assertIsNone(first['previous'])
+        second = self.guest.get(first['next']).json()
+        self.assertEqual(second['results'][0]['text'], 'Post 14')
+        self.assertIsNotNone(second['previous'])
+
+    def test_sparse_fields_and_filters(self):
+        response = self.guest.get(reverse('api:posts'), {
+            'fields': 'id,group', 'group': 'apps', 'limit': 2})
+        self.assertEqual([set(post) for post in response.json()['results']],
+                         [{'id', 'group'}] * 2)
+        self.assertEqual(response.json()['results'][0]['group'], 'apps')
+
+    def test_etag_returns_not_modified(self):
+        url = reverse('api:groups')
+        response = self.guest.get(url)
+        self.assertEqual(response.json()['results'][0]['slug'], 'apps')
+        response = self.guest.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_create_and_edit_post(self):
+        response = self.guest.post(
+            reverse('api:posts'), {'text': 'From the app', 'group': 'apps'},
+            content_type='application/json',
+            **basic_auth('Api', 'secret-pass'))
+        self.assertEqual(response.status_code, 201)
+        post_id = response.json()['id']
+        self.assertEqual(response.json()['group'], 'apps')
+        url = reverse('api:post', kwargs={'post_id': post_id})
+        response = self.client.patch(url, {'text': 'Hijacked'},
+                                     content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+        response = self.guest.patch(url, {'text': 'Edited'},
+                                    content_type='application/json',
+                                    **basic_auth('Api', 'secret-pass'))
+        self.assertEqual(response.json()['text'], 'Edited')
+        self.assertEqual(response.json()['group'], 'apps')
+
+    def test_delete_post(self):
+        post = Post.objects.create(text='Doomed', author=ApiTest.author)
+        create_comment(post, ApiTest.reader, 'Bye')
+        url = reverse('api:post', kwargs={'post_id': post.pk})
+        self.assertEqual(self.client.delete(url).status_code, 403)
+        response = self.guest.delete(url, **basic_auth('Api', 'secret-pass'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(Comment.objects.filter(post=post.pk).exists())
+
+    def test_write_needs_authentication(self):
+        response = self.guest.post(reverse('api:posts'), {'text': 'Anon'},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 401)
+        response = self.guest.post(
+            reverse('api:posts'), {'text': 'Anon'},
+            content_type='application/json', **basic_auth('Api', 'wrong'))
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Post.objects.filter(text='Anon').exists())
+
+    def test_comments(self):
+        post = Post.objects.first()
+        url = reverse('api:comments', kwargs={'post_id': post.id})
+        root = self.client.post(url, {'text': 'Root'},
+                                content_type='application/json').json()
+        reply = self.client.post(url, {'text': 'Reply', 'parent': root['id']},
+                                 content_type='application/json').json()
+        self.assertEqual(reply['parent'], root['id'])
+        self.assertEqual(root['updated'], root['created'])
+        response = self.client.post(url, {'text': 'Lost', 'parent': 0},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [comment['text'] for comment in self.guest.get(url).json()[
+                'results']], ['Reply', 'Root'])
+        self.assertEqual(Comment.objects.filter(post=post).count(), 2)
+
+    def test_follows(self):
+        response = self.client.post(reverse('api:follows'), {'author': 'Api'},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            self.client.get(reverse('api:follows')).json()['results'],
+            [{'user': 'Mobile', 'author': 'Api'}])
+        response = self.client.delete(
+            reverse('api:follow', kwargs={'username': 'Api'}))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_export_streams_ndjson(self):
+        response = self.guest.get(reverse('api:posts_export'),
+                                  {'fields': 'text', 'author': 'Api'})
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(
+            response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(rows[0], {'text': 'Post 0'})
+
+    def test_errors_are_json(self):
+        response = self.guest.get(reverse('api:post', kwargs={'post_id': 0}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Not found.'})
+        response = self.guest.put(reverse('api:posts'))
+        self.assertEqual(response.status_code, 405)
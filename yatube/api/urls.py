@@ -0,0 +1,16 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.posts, name='posts'),
+    path('posts/export.ndjson', views.posts_export, name='posts_export'),
+    path('posts/<int:post_id>/', views.post_detail, name='post'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
+    path('groups/', views.groups, name='groups'),
+    path('groups/<slug:slug>/', views.group_detail, name='group'),
+    path('follows/', views.follows, name='follows'),
+    path('follows/<str:username>/', views.follow_detail, name='follow'),
+]
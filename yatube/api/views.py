@@ -0,0 +1,285 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import wraps
+
+from django.contrib.auth import authenticate
+from django.http import (Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag, urlencode
+from django.views.decorators.csrf import csrf_exempt
+from posts.deletion import delete_posts
+from posts.forms import PostForm
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import CursorPaginator
+from posts.routers import replica_reads
+from posts.services import create_comment
+
+from .serializers import (CommentSerializer, FollowSerializer,
+                          GroupSerializer, PostSerializer)
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EXPORT_CHUNK_SIZE = 2000
+
+
+class ApiError(Exception):
+    def __init__(self, status, detail, **headers):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+        self.headers = headers
+
+
+def error_response(status, detail, **headers):
+    response = JsonResponse({'detail': detail}, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def basic_auth_user(request):
+    '''Returns the user of an Authorization: Basic header, or None.'''
+    scheme, _, credentials = request.META.get(
+        'HTTP_AUTHORIZATION', '').partition(' ')
+    if scheme.lower() != 'basic':
+        return None
+    try:
+        username, _, password = base64.b64decode(
+            credentials).decode().partition(':')
+    except (binascii.Error, UnicodeDecodeError):
+        username = password = None
+    user = username and authenticate(
+        request, username=username, password=password)
+    if not user:
+        raise ApiError(401, 'Invalid username or password.',
+                       WWW_Authenticate='Basic realm="api"')
+    return user
+
+
+def api_view(*methods):
+    '''Turns a view into a JSON API endpoint accepting the given methods.
+
+    Clients authenticate with HTTP Basic or with the site session; unsafe
+    requests on a session must pass the CSRF check like the HTML forms.
+    '''
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            allowed = methods + (('HEAD',) if 'GET' in methods else ())
+            if request.method not in allowed:
+                return error_response(
+                    405, f'Method {request.method} is not allowed.',
+                    Allow=', '.join(allowed))
+            try:
+                user = basic_auth_user(request)
+                if user is not None:
+                    request.user = user
+                elif (request.method not in ('GET', 'HEAD')
+                        and request.user.is_authenticated):
+                    csrf = CsrfViewMiddleware(lambda request: None)
+                    csrf.process_request(request)
+                    if csrf.process_view(request, None, (), {}):
+                        raise ApiError(403, 'CSRF check failed.')
+                return view(request, *args, **kwargs)
+            except ApiError as error:
+                return error_response(
+                    error.status, error.detail, **{
+                        header.replace('_', '-'): value
+                        for header, value in error.headers.items()})
+            except Http404:
+                return error_response(404, 'Not found.')
+        return wrapper
+    return decorator
+
+
+def require_user(request):
+    if not request.user.is_authenticated:
+        raise ApiError(401, 'Authentication required.',
+                       WWW_Authenticate='Basic realm="api"')
+    return request.user
+
+
+def request_data(request):
+    if request.content_type == 'multipart/form-data':
+        return request.POST.dict(), request.FILES
+    try:
+        data = json.loads(request.body or '{}')
+    except ValueError:
+        raise ApiError(400, 'Malformed JSON.')
+    if not isinstance(data, dict):
+        raise ApiError(400, 'Expected a JSON object.')
+    return data, None
+
+
+def json_response(request, data, status=200):
+    '''A JSON response that is answered with 304 when the ETag matches.'''
+    response = JsonResponse(data, status=status,
+                            json_dumps_params={'ensure_ascii': False})
+    if request.method in ('GET', 'HEAD') and status == 200:
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        response['ETag'] = etag
+        return get_conditional_response(
+            request, etag=etag, response=response)
+    return response
+
+
+def page_response(request, queryset, serializer_class, field):
+    '''A cursor paginated list, see posts.paginators.CursorPaginator.'''
+    try:
+        limit = min(int(request.GET.get('limit', PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        limit = PAGE_SIZE
+    limit = max(limit, 1)
+    page = CursorPaginator(queryset, limit, field).get_page(
+        request.GET.get('cursor'))
+    serialize = serializer_class(request.GET.get('fields'))
+
+    def link(cursor):
+        if cursor is None:
+            return None
+        query = urlencode({**request.GET.dict(), 'cursor': cursor})
+        return f'{request.path}?{query}'
+
+    return json_response(request, {
+        'results': [serialize(obj) for obj in page],
+        'next': link(page.next_cursor),
+        'previous': link(page.previous_cursor),
+    })
+
+
+def filter_posts(request, posts):
+    if 'author' in request.GET:
+        posts = posts.filter(author__username=request.GET['author'])
+    if 'group' in request.GET:
+        posts = posts.filter(group__slug=request.GET['group'])
+    return posts
+
+
+def save_post(request, form):
+    if not form.is_valid():
+        raise ApiError(400, form.errors.get_json_data())
+    return form.save()
+
+
+def post_form(request, post=None):
+    data, files = request_data(request)
+    if post is not None:
+        data = {'text': post.text,
+                'group': post.group.slug if post.group_id else None, **data}
+    if data.get('group'):
+        group = Group.objects.filter(slug=data['group']).first()
+        data['group'] = group.pk if group else -1
+    form = PostForm(data, files, instance=post)
+    form.instance.author = request.user
+    return form
+
+
+@api_view('GET', 'POST')
+@replica_reads
+def posts(request):
+    if request.method == 'POST':
+        require_user(request)
+        post = save_post(request, post_form(request))
+        return json_response(request, PostSerializer()(post), status=201)
+    return page_response(
+        request, filter_posts(request, Post.objects.feed()),
+        PostSerializer, 'pub_date')
+
+
+@api_view('GET')
+def posts_export(request):
+    '''Streams posts as NDJSON, read through a server-side cursor.'''
+    serialize = PostSerializer(request.GET.get('fields'))
+    posts = filter_posts(request, Post.objects.feed()).order_by('id')
+    rows = (json.dumps(serialize(post), ensure_ascii=False) + '\n'
+            for post in posts.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+    return StreamingHttpResponse(
+        rows, content_type='application/x-ndjson; charset=utf-8')
+
+
+@api_view('GET', 'PATCH', 'DELETE')
+@replica_reads
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    if request.method == 'GET':
+        return json_response(
+            request, PostSerializer(request.GET.get('fields'))(post))
+    if require_user(request) != post.author:
+        raise ApiError(403, 'Only the author can change the post.')
+    if request.method == 'DELETE':
+        # the same batched delete as the site and the admin
+        delete_posts(Post.objects.filter(pk=post.pk))
+        return HttpResponse(status=204)
+    post = save_post(request, post_form(request, post))
+    return json_response(request, PostSerializer()(post))
+
+
+@api_view('GET', 'POST')
+@replica_reads
+def comments(request, post_id):
+    post = get_object_or_404(Post, pk=post_id)
+    if request.method == 'POST':
+        author = require_user(request)
+        data, _ = request_data(request)
+        text = str(data.get('text', '')).strip()
+        if not text:
+            raise ApiError(400, {'text': 'This field is required.'})
+        try:
+            parent = data.get('parent')
+            comment = create_comment(
+                post, author, text, None if parent is None else int(parent))
+        except (Comment.DoesNotExist, TypeError, ValueError):
+            raise ApiError(400, {'parent': 'No such comment on the post.'})
+        comment.author = author
+        return json_response(
+            request, CommentSerializer()(comment), status=201)
+    return page_response(
+        request, post.comments.select_related('author'),
+        CommentSerializer, 'created')
+
+
+@api_view('GET')
+@replica_reads
+def groups(request):
+    return page_response(request, Group.objects.all(), GroupSerializer, 'id')
+
+
+@api_view('GET')
+@replica_reads
+def group_detail(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return json_response(
+        request, GroupSerializer(request.GET.get('fields'))(group))
+
+
+@api_view('GET', 'POST')
+def follows(request):
+    user = require_user(request)
+    if request.method == 'POST':
+        data, _ = request_data(request)
+        author = get_object_or_404(User, username=data.get('author'))
+        if author == user:
+            raise ApiError(400, {'author': 'You cannot follow yourself.'})
+        follow, created = Follow.objects.get_or_create(
+            user=user, author=author)
+        return json_response(request, FollowSerializer()(follow),
+                             status=201 if created else 200)
+    return page_response(
+        request, user.follower.select_related('user', 'author'),
+        FollowSerializer, 'id')
+
+
+@api_view('DELETE')
+def follow_detail(request, username):
+    user = require_user(request)
+    follow = get_object_or_404(
+        Follow, user=user, author__username=username)
+    follow.delete()
+    return HttpResponse(status=204)
@@ -1,11 +1,66 @@
+from functools import reduce
+from operator import or_
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.contrib.auth import get_permission_codename
 from django.contrib.auth.admin import UserAdmin
+from django.db.models import Q
+
+from .avatars import attach_avatars
+from .deletion import delete_posts, delete_user_later
+from .models import Comment, Follow, Group, Post, User
+from .search import search_posts
+
+
+class DeletionSummaryMixin:
+    '''Shows counts on the delete confirmation page instead of every row.
+
+    The stock page collects all the related objects, which for a user with
+    thousands of comments does not finish within a request.
+
+    deleted_with maps each model whose rows go along with the objects to the
+    lookups from it to them. The page counts those rows, and deleting asks
+    for the delete permission on each of the models, as the stock page does.
+    '''
+    deleted_with = {}
+
+    def deletion_counts(self, objs):
+        counts = {self.opts.verbose_name_plural: len(objs)}
+        for model, lookups in self.deleted_with.items():
+            related = reduce(or_, (Q(**{f'{lookup}__in': objs})
+                                   for lookup in lookups))
+            counts[model._meta.verbose_name_plural] = (
+                model.objects.filter(related).count())
+        return counts
+
+    def can_delete(self, request, model):
+        model_admin = self.admin_site._registry.get(model)
+        if model_admin is not None:
+            return model_admin.has_delete_permission(request)
+        opts = model._meta
+        codename = get_permission_codename('delete', opts)
+        return request.user.has_perm(f'{opts.app_label}.{codename}')
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        perms_needed = {model._meta.verbose_name
+                        for model in (self.model, *self.deleted_with)
+                        if not self.can_delete(request, model)}
+        return ([str(obj) for obj in objs], self.deletion_counts(objs),
+                perms_needed, [])
 
-from .models import Group, Post, User
+
+class AvatarChangeList(ChangeList):
+    '''Resolves the avatars of a page of users at once.'''
+
+    def get_results(self, request):
+        super().get_results(request)
+        attach_avatars(self.result_list)
 
 
 @admin.register(User)
-class MyUserAdmin(UserAdmin):
+class MyUserAdmin(DeletionSummaryMixin, UserAdmin):
     list_display = [
         'avatar_tag',
         'username',
@@ -46,6 +101,22 @@ class MyUserAdmin(UserAdmin):
     ordering = ('email', )
     search_fields = ('username', 'role')
     list_filter = ('is_active', 'role')
+    deleted_with = {
+        Post: ('author',),
+        Comment: ('author',),
+        Follow: ('user', 'author'),
+    }
+
+    def get_changelist(self, request, **kwargs):
+        return AvatarChangeList
+
+    def delete_model(self, request, obj):
+        # users with many posts and comments are deleted in the background
+        delete_user_later(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            delete_user_later(user)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -58,11 +129,24 @@ class GroupAdmin(admin.ModelAdmin):
 admin.site.register(Group, GroupAdmin,)
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(DeletionSummaryMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    deleted_with = {Comment: ('post',)}
+
+    def get_search_results(self, request, queryset, search_term):
+        # full-text search over the GIN index instead of ILIKE on text
+        if not search_term:
+            return queryset, False
+        return search_posts(search_term, queryset), False
+
+    def delete_model(self, request, obj):
+        delete_posts(Post.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_posts(queryset)
 
 
 admin.site.register(Post, PostAdmin,)
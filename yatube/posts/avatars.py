@@ -0,0 +1,81 @@
+import hashlib
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .images import AVATAR_LIST_WIDTH, variant_url
+from .thumbnails import AVATAR_THUMBNAIL, lookup
+
+cache = ConnectionProxy(caches, 'avatars')
+
+AVATAR_KEY = 'avatar:{}'
+
+# url is the original or the default avatar, thumbnail is a srcset variant;
+# avatars uploaded before the variants get a sorl thumbnail instead, None
+# while it is being generated
+Avatar = namedtuple('Avatar', 'url thumbnail')
+
+
+def avatar_key(name):
+    # stored names may hold characters memcached does not take in keys
+    return AVATAR_KEY.format(hashlib.md5(name.encode()).hexdigest())
+
+
+def thumbnail_urls(names):
+    '''URLs of the avatar thumbnails that are ready, by avatar name.'''
+    geometry, options = AVATAR_THUMBNAIL
+    return {name: thumbnail.url for name, thumbnail in lookup(
+        names, geometry, options).items() if thumbnail is not None}
+
+
+def legacy_thumbnails(names):
+    '''Thumbnail URLs of avatars without variants, one cache round trip.
+
+    They are cached by avatar name for AVATAR_CACHE_TIMEOUT, so a page with
+    hundreds of commenters does not ask sorl about each of them. Pending
+    thumbnails are not cached and are looked up again next time.
+    '''
+    keys = {avatar_key(name): name for name in names}
+    thumbnails = {keys[key]: url
+                  for key, url in cache.get_many(list(keys)).items()}
+    missing = names - thumbnails.keys()
+    if missing:
+        ready = thumbnail_urls(missing)
+        cache.set_many({avatar_key(name): url for name, url in ready.items()},
+                       settings.AVATAR_CACHE_TIMEOUT)
+        thumbnails.update(ready)
+    return thumbnails
+
+
+def resolve_avatars(users):
+    '''Avatars of the users by id.
+
+    Uploaded avatars show their smallest fitting variant, which is stored
+    on the user, only the ones uploaded before the variants are looked up.
+    '''
+    users = {user.pk: user for user in users}
+    legacy = {user.avatar.name for user in users.values()
+              if user.avatar and not user.avatar_variants}
+    thumbnails = legacy_thumbnails(legacy) if legacy else {}
+    avatars = {}
+    for pk, user in users.items():
+        if user.avatar_variants:
+            avatars[pk] = Avatar(user.avatar.url, variant_url(
+                user.avatar_variants, AVATAR_LIST_WIDTH) or user.avatar.url)
+        elif user.avatar:
+            avatars[pk] = Avatar(user.avatar.url,
+                                 thumbnails.get(user.avatar.name))
+        else:
+            avatars[pk] = Avatar(user.get_avatar(), user.get_avatar())
+    return avatars
+
+
+def attach_avatars(users):
+    '''Sets resolved_avatar on each user, several may share an id.'''
+    users = list(users)
+    avatars = resolve_avatars(users)
+    for user in users:
+        user.resolved_avatar = avatars[user.pk]
+    return users
@@ -0,0 +1,280 @@
+import json
+import math
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Count
+from django.template import Engine
+from django.template.context import make_context
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .counters import view_counter
+from .middleware import QueryCounter
+from .models import Comment, Group, Post, User
+from .stats import get_author_stats
+from .thumbnails import attach_thumbnails
+from .timeline import timeline_posts
+from .views import POSTS_PER_PAGE
+
+Scenario = namedtuple('Scenario', 'name url method data user',
+                      defaults=('GET', None, None))
+
+
+def percentile(values, share):
+    '''Nearest-rank percentile of a list of numbers.'''
+    values = sorted(values)
+    return values[max(math.ceil(share * len(values)) - 1, 0)]
+
+
+def busiest():
+    '''The most followed author, the reader following the most authors,
+    the most commented post of the author and the largest group.'''
+    author = User.objects.annotate(followers=Count('following')).order_by(
+        '-followers', 'pk').first()
+    reader = User.objects.annotate(follows=Count('follower')).order_by(
+        '-follows', 'pk').first()
+    post = Post.objects.filter(author=author).order_by(
+        '-comment_count', 'pk').first()
+    group = Group.objects.annotate(size=Count('posts')).order_by(
+        '-size', 'pk').first()
+    if None in (author, reader, post, group):
+        raise ValueError('Seed the database first, see seed_data')
+    return author, reader, post, group
+
+
+def scenarios():
+    '''Requests to the views of posts.views, built from the data in the db.
+
+    The busiest author, post, group and thread are picked, as those are the
+    pages that get slow first. Deleting views are left out, only their first
+    request would do any work.
+    '''
+    author, reader, post, group = busiest()
+    # the root with the largest thread under it
+    thread = Comment.objects.filter(post=post).values('path__0').annotate(
+        size=Count('pk')).order_by('-size', 'path__0').first()
+    post_kwargs = {'username': author.username, 'post_id': post.pk}
+    word = max(post.text.split(), key=len).strip('.,!?')
+    result = [
+        Scenario('index', reverse('index')),
+        Scenario('index_reader', reverse('index'), user=reader),
+        Scenario('group', reverse('group', kwargs={'slug': group.slug})),
+        Scenario('profile', reverse('profile', kwargs={
+            'username': author.username})),
+        Scenario('post', reverse('post', kwargs=post_kwargs)),
+        Scenario('post_reader', reverse('post', kwargs=post_kwargs),
+                 user=reader),
+        Scenario('search', f"{reverse('search')}?{urlencode({'q': word})}"),
+        Scenario('follow_index', reverse('follow_index'), user=reader),
+        Scenario('new_post_form', reverse('new_post'), user=author),
+        Scenario('new_post', reverse('new_post'), 'POST',
+                 {'text': 'Benchmark post'}, author),
+        Scenario('post_edit_form', reverse('edit', kwargs=post_kwargs),
+                 user=author),
+        Scenario('add_comment', reverse('add_comment', kwargs=post_kwargs),
+                 'POST', {'text': 'Benchmark comment'}, reader),
+        Scenario('profile_follow', reverse('profile_follow', kwargs={
+            'username': author.username}), user=reader),
+        Scenario('profile_unfollow', reverse('profile_unfollow', kwargs={
+            'username': author.username}), user=reader),
+    ]
+    if thread is not None:
+        result.append(Scenario('comment_replies', reverse(
+            'comment_replies', kwargs={**post_kwargs,
+                                       'comment_id': thread['path__0']})))
+    return result
+
+
+def measure(scenario, repeat=20, warmup=3):
+    '''Times the requests of a scenario.
+
+    Returns latencies in milliseconds, the queries of the last request and
+    the peak of memory allocated while serving it, in KiB. Memory is traced
+    on a separate request as tracing slows everything down.
+    '''
+    client = Client()
+    if scenario.user is not None:
+        client.force_login(scenario.user)
+    send = getattr(client, scenario.method.lower())
+
+    def request():
+        response = send(scenario.url, scenario.data or {})
+        if response.status_code >= 400:
+            raise AssertionError(
+                f'{scenario.name}: {scenario.url} answered '
+                f'{response.status_code}')
+        return response
+
+    for _ in range(warmup):
+        request()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        request()
+        timings.append((time.perf_counter() - start) * 1000)
+    counter = QueryCounter()
+    tracemalloc.start()
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            request()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries': counter.queries,
+        'p50': round(percentile(timings, 0.5), 3),
+        'p95': round(percentile(timings, 0.95), 3),
+        'memory': round(peak / 1024, 1),
+    }
+
+
+def isolated_caches():
+    '''A fresh local memory cache for every alias of the site.'''
+    return {alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': f'benchmark:{alias}:{time.monotonic_ns()}'}
+            for alias in settings.CACHES}
+
+
+def run(repeat=20, warmup=3, names=None):
+    '''Measures every scenario, or the named ones, in a rolled back
+    transaction so the benchmark leaves the data as it was.
+
+    The caches are swapped for empty ones and the views counted meanwhile
+    are dropped, which the rollback would not undo.
+    '''
+    results = {}
+    with ExitStack() as stack:
+        stack.enter_context(override_settings(CACHES=isolated_caches()))
+        stack.enter_context(view_counter.discarding())
+        stack.enter_context(transaction.atomic())
+        for scenario in scenarios():
+            if names and scenario.name not in names:
+                continue
+            results[scenario.name] = measure(scenario, repeat, warmup)
+        transaction.set_rollback(True)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    '''Lists the regressions of results against a baseline.
+
+    Any extra query is a regression, latency and memory may grow by the
+    tolerance share before they count.
+    '''
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(
+                f"{name}: {result['queries']} queries, "
+                f"baseline {base['queries']}")
+        for metric in ('p95', 'memory'):
+            if result[metric] > base[metric] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: {metric} {result[metric]}, '
+                    f'baseline {base[metric]}')
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path) as baseline:
+            return json.load(baseline)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(path, results):
+    with open(path, 'w') as baseline:
+        json.dump(results, baseline, indent=2, sort_keys=True)
+        baseline.write('\n')
+
+
+def template_engine(cached):
+    '''An engine set up as the site's, with or without the cached loader.'''
+    engine = Engine.get_default()
+    loaders = settings.TEMPLATE_LOADERS
+    if cached:
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    return Engine(
+        dirs=engine.dirs, context_processors=engine.context_processors,
+        debug=engine.debug, loaders=loaders,
+        string_if_invalid=engine.string_if_invalid,
+        libraries=engine.libraries, autoescape=engine.autoescape)
+
+
+def feed_contexts():
+    '''The feed templates with the viewer and context of their first page.
+
+    The pages are loaded up front, so only rendering is measured.
+    '''
+    author, reader, _, group = busiest()
+    stats = get_author_stats(author.pk)
+
+    def first_page(posts):
+        page = Paginator(posts, POSTS_PER_PAGE).get_page(1)
+        attach_thumbnails(page)
+        return page
+
+    return {
+        'index.html': (None, {
+            'page': first_page(Post.objects.feed()), 'all': True,
+            'follow': False}),
+        'group.html': (None, {
+            'page': first_page(group.posts.feed()), 'group': group}),
+        'profile.html': (None, {
+            'page': first_page(Post.objects.filter(author=author).feed()),
+            'author': author, 'post_count': stats['posts'],
+            'followers': stats['followers'], 'following': False,
+            'follow': stats['following']}),
+        'follow.html': (reader, {
+            'page': first_page(timeline_posts(reader).feed()),
+            'follow': True, 'all': False}),
+    }
+
+
+def measure_render(engine, name, request, context, repeat=50, warmup=3):
+    '''Milliseconds to load and render a template, as a view does.'''
+    def render():
+        engine.get_template(name).render(make_context(context, request))
+
+    for _ in range(warmup):
+        render()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'p50': round(percentile(timings, 0.5), 3),
+            'p95': round(percentile(timings, 0.95), 3)}
+
+
+def run_templates(repeat=50, warmup=3):
+    '''Render times of the feed pages without and with the cached loader.
+
+    Without it every include of post_item.html in a feed loop is read and
+    parsed again on each render.
+    '''
+    modes = {'uncached': template_engine(False),
+             'cached': template_engine(True)}
+    results = {}
+    for name, (user, context) in feed_contexts().items():
+        request = RequestFactory().get('/')
+        request.user = user or AnonymousUser()
+        results[name] = {
+            mode: measure_render(engine, name, request, context, repeat,
+                                 warmup)
+            for mode, engine in modes.items()}
+    return results
@@ -0,0 +1,79 @@
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django.utils.functional import SimpleLazyObject
+
+cache = ConnectionProxy(caches, 'feeds')
+
+FEED_VERSION_KEY = 'feed:version'
+
+
+def feed_version():
+    '''Current version of the cached feed pages.'''
+    version = cache.get(FEED_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        cache.set(FEED_VERSION_KEY, version, None)
+    return version
+
+
+def invalidate_feeds():
+    '''Makes every cached feed page stale by moving to a new version.'''
+    cache.set(FEED_VERSION_KEY, time.time_ns(), None)
+
+
+def feed_page(request, produce_page):
+    '''Returns the template context for a feed that may be served cached.
+
+    Anonymous visitors share a whole rendered feed for
+    FEED_PAGE_CACHE_TIMEOUT seconds. Their page is produced lazily, so on
+    a cache hit the feed queries never run.
+    '''
+    if request.user.is_authenticated or not settings.FEED_PAGE_CACHE_TIMEOUT:
+        return {'page': produce_page()}
+    return {
+        'page': SimpleLazyObject(produce_page),
+        'feed_cache_key': f'{feed_version()}:{request.get_full_path()}',
+        'feed_cache_timeout': settings.FEED_PAGE_CACHE_TIMEOUT,
+    }
+
+
+def feed_etag(request, *args, **kwargs):
+    '''ETag of a page: the feed version, the viewer and the URL.
+
+    Costs no query. The version moves on any post, comment or follow
+    change, so deleted posts are covered too. The CSRF cookie is part of
+    the key as the forms on the page embed its token.
+
+    The version is one for all pages: a change anywhere revalidates every
+    feed and post page. A version per feed would need every write to know
+    each page showing it, comment counts and author stats included; one
+    key is a single cache get and cannot miss a page. None, so no 304,
+    unless CONDITIONAL_FEEDS is on.
+    '''
+    if not settings.CONDITIONAL_FEEDS:
+        return None
+    key = '|'.join(map(str, (
+        feed_version(), request.user.pk, request.META.get('CSRF_COOKIE'),
+        request.get_full_path())))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def feed_last_modified(request, *args, **kwargs):
+    '''Last-Modified of a page: when the feed version last moved.
+
+    Costs no query. Every change that moves the version, deletes and
+    follows included, moves it forward, so it never goes back to an older
+    date. It is left out during the first second of a version, as a change
+    later in that second would share its HTTP date; the ETag still works.
+    '''
+    if not settings.CONDITIONAL_FEEDS:
+        return None
+    version = feed_version()
+    if time.time_ns() - version < 10 ** 9:
+        return None
+    return datetime.fromtimestamp(version / 10 ** 9, timezone.utc)
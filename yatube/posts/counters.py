@@ -0,0 +1,152 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils.connection import ConnectionProxy
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+cache = ConnectionProxy(caches, 'counters')
+
+VIEW_KEY = 'post_views:{}'
+FLUSH_REQUEST_KEY = 'post_views:flush_request'
+
+
+def view_key(post_id):
+    return VIEW_KEY.format(post_id)
+
+
+def write_views(views):
+    '''Adds buffered views to Post.counter, one UPDATE per distinct delta.'''
+    post_ids_by_delta = defaultdict(list)
+    for post_id, delta in views.items():
+        post_ids_by_delta[delta].append(post_id)
+    with transaction.atomic():
+        for delta, post_ids in post_ids_by_delta.items():
+            Post.objects.filter(pk__in=post_ids).update(
+                counter=F('counter') + delta)
+
+
+def request_flush():
+    '''Has every worker flush its views within a second, as before a deploy.'''
+    cache.set(FLUSH_REQUEST_KEY, time.time_ns(), None)
+
+
+class ViewCounter:
+    '''Counts post views in memory instead of saving Post on every hit.
+
+    Every process keeps the views it served, and a timer thread adds them
+    to Post.counter once per VIEW_COUNTER_FLUSH_INTERVAL seconds, outside of
+    any request. The shared cache only mirrors the views not written yet,
+    so that all workers show the same count; an evicted key makes the count
+    lag until the next flush, the views themselves are not lost.
+
+    A worker also flushes when it exits and when the flush_view_counts
+    command asks for it, so a restart does not drop the views of the last
+    interval.
+
+    With VIEW_COUNTER_FLUSH_INTERVAL = 0 every view is written right away.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._views = Counter()
+        self._timer = None
+
+    def hit(self, post_id):
+        '''Records a view and returns the number of views not yet flushed.'''
+        if not settings.VIEW_COUNTER_FLUSH_INTERVAL:
+            write_views({post_id: 1})
+            return 0
+        with self._lock:
+            self._views[post_id] += 1
+            if self._timer is None:
+                self._timer = threading.Thread(
+                    target=self.run, name='view-counter', daemon=True)
+                self._timer.start()
+                atexit.register(self.flush_at_exit)
+        key = view_key(post_id)
+        try:
+            pending = cache.incr(key)
+        except ValueError:
+            if cache.add(key, 1, None):
+                pending = 1
+            else:
+                pending = cache.incr(key)
+        # an evicted key may come back below the views still to be written
+        return max(pending, 0)
+
+    @contextmanager
+    def discarding(self):
+        '''Drops the views counted inside the block, flushes wait for it.
+
+        For measurements whose views must not reach Post.counter.
+        '''
+        with self._flush_lock:
+            with self._lock:
+                kept, self._views = self._views, Counter()
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._views = kept
+
+    def flush(self):
+        '''Writes the views served by this process, returns their number.'''
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self):
+        with self._lock:
+            views, self._views = self._views, Counter()
+        if not views:
+            return 0
+        try:
+            write_views(views)
+        except Exception:
+            with self._lock:
+                self._views.update(views)
+            raise
+        for post_id, delta in views.items():
+            try:
+                cache.decr(view_key(post_id), delta)
+            except ValueError:
+                pass
+        return sum(views.values())
+
+    def flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Flushing post views at exit failed')
+
+    def run(self):
+        flushed_at = time.monotonic()
+        requested = cache.get(FLUSH_REQUEST_KEY)
+        while True:
+            time.sleep(1)
+            try:
+                request = cache.get(FLUSH_REQUEST_KEY)
+                if (request == requested and time.monotonic() - flushed_at
+                        < settings.VIEW_COUNTER_FLUSH_INTERVAL):
+                    continue
+                requested, flushed_at = request, time.monotonic()
+                self.flush()
+            except Exception:
+                # the views are kept and written by the next flush
+                logger.exception('Flushing post views failed')
+            finally:
+                connections.close_all()
+
+
+view_counter = ViewCounter()
@@ -0,0 +1,227 @@
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils.connection import ConnectionProxy
+from sorl.thumbnail import delete as delete_image
+
+from .caching import invalidate_feeds
+from .images import variant_names
+from .models import Comment, Follow, Post, TimelineEntry, User
+from .services import recount_comments
+from .stats import invalidate_author_stats
+
+logger = logging.getLogger(__name__)
+
+cache = ConnectionProxy(caches, 'stats')
+
+PROGRESS_KEY = 'deletion:user:{}'
+PROGRESS_TIMEOUT = 24 * 60 * 60
+
+DELETE_SQL = 'DELETE FROM {table} WHERE {column} = ANY(%s)'
+
+
+def raw_delete(model, column, ids):
+    '''Deletes rows by a column with one statement, without signals.'''
+    sql = DELETE_SQL.format(
+        table=connection.ops.quote_name(model._meta.db_table),
+        column=connection.ops.quote_name(column))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(ids)])
+        return cursor.rowcount
+
+
+def batches(queryset, batch_size):
+    '''Yields lists of primary keys until the queryset is empty.
+
+    The caller deletes each batch, so the same query keeps returning the
+    next one.
+    '''
+    queryset = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        ids = list(queryset[:batch_size])
+        if not ids:
+            return
+        yield ids
+
+
+def cleanup_files(names):
+    '''Drops a reference to each image or variant from the storage.
+
+    Identical uploads share one file and its thumbnails, so they are only
+    deleted with the last reference.
+    '''
+    for name in names:
+        try:
+            if default_storage.release(name):
+                delete_image(name, delete_file=False)
+        except Exception:
+            logger.exception('Could not delete %s', name)
+
+
+def delete_posts(posts, batch_size=None, progress=None):
+    '''Deletes posts with their comments and timeline entries in batches.
+
+    Each batch is a few set-based DELETEs in its own transaction instead of
+    the collector loading every related row. The images are released by
+    the deletion pool once the batch commits. progress, if given, is called
+    with the number of posts deleted so far. Returns that number.
+    '''
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    deleted = 0
+    for ids in batches(posts, batch_size):
+        with transaction.atomic():
+            rows = list(Post.objects.filter(pk__in=ids).values_list(
+                'author', 'image', 'image_variants'))
+            # neither model has signals or dependent rows, so both are
+            # single DELETE statements
+            Comment.objects.filter(post__in=ids).delete()
+            TimelineEntry.objects.filter(post__in=ids).delete()
+            deleted += raw_delete(Post, 'id', ids)
+            images = [name for _, image, variants in rows if image
+                      for name in (image, *variant_names(variants))]
+            if images:
+                release_later(images)
+        invalidate_feeds()
+        invalidate_author_stats(*{author for author, *_ in rows})
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+def delete_comments_of(user, batch_size=None, progress=None):
+    '''Deletes the comments of a user together with the replies to them.'''
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    deleted = 0
+    for ids in batches(Comment.objects.filter(author=user), batch_size):
+        with transaction.atomic():
+            # the GIN index on path finds the whole subtrees
+            thread = Comment.objects.filter(path__overlap=ids)
+            posts = set(thread.values_list('post', flat=True))
+            deleted += thread.delete()[0]
+            recount_comments(Post.objects.filter(pk__in=posts))
+        invalidate_feeds()
+        if progress is not None:
+            progress(deleted)
+    return deleted
+
+
+class Progress:
+    '''Progress of a user deletion, kept in the cache for any worker.'''
+
+    def __init__(self, user_id, report=None):
+        self.key = PROGRESS_KEY.format(user_id)
+        self.report = report
+        self.state = {'stage': 'queued', 'deleted': Counter(),
+                      'done': False, 'error': None}
+
+    def save(self, **changes):
+        self.state.update(changes)
+        cache.set(self.key, self.state, PROGRESS_TIMEOUT)
+        if self.report is not None:
+            self.report(self.state)
+
+    def counter(self, name):
+        def update(count):
+            self.state['deleted'][name] = count
+            self.save(stage=name)
+        return update
+
+
+def deletion_progress(user_id):
+    '''What is known about the deletion of a user, or None.'''
+    return cache.get(PROGRESS_KEY.format(user_id))
+
+
+def delete_user(user_id, batch_size=None, report=None):
+    '''Deletes a user and everything they wrote, in batches.
+
+    Comments, posts and follows go first with set-based deletes, so the
+    final User.delete() has almost nothing left to collect. report, if
+    given, is called with the progress after every batch.
+    '''
+    progress = Progress(user_id, report)
+    user = User.objects.filter(pk=user_id).first()
+    if user is None:
+        progress.save(stage='done', done=True)
+        return progress.state
+    try:
+        delete_comments_of(user, batch_size, progress.counter('comments'))
+        delete_posts(Post.objects.filter(author=user), batch_size,
+                     progress.counter('posts'))
+        progress.save(stage='follows')
+        with transaction.atomic():
+            related = set()
+            for follower, author in Follow.objects.filter(
+                    Q(user=user) | Q(author=user)).values_list(
+                        'user', 'author'):
+                related.update((follower, author))
+            # the posts are gone from the timelines already, the follow
+            # signals would only prune them again one follow at a time
+            progress.state['deleted']['follows'] = (
+                raw_delete(Follow, 'user_id', [user.pk])
+                + raw_delete(Follow, 'author_id', [user.pk]))
+            TimelineEntry.objects.filter(user=user).delete()
+            avatars = [user.avatar.name, *variant_names(
+                user.avatar_variants)] if user.avatar else []
+            user.delete()
+            if avatars:
+                release_later(avatars)
+        invalidate_author_stats(*related)
+        invalidate_feeds()
+    except Exception as error:
+        progress.save(error=str(error))
+        raise
+    progress.save(stage='done', done=True)
+    return progress.state
+
+
+class DeletionPool:
+    '''Runs deletions and file cleanup outside the request.
+
+    With DELETION_WORKERS = 0 the work is done right away instead.
+    '''
+
+    def __init__(self):
+        self.executor = None
+        self.lock = threading.Lock()
+
+    def submit(self, function, *args):
+        if not settings.DELETION_WORKERS:
+            function(*args)
+            return
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    settings.DELETION_WORKERS,
+                    thread_name_prefix='deletion')
+        self.executor.submit(self.run, function, args)
+
+    def run(self, function, args):
+        try:
+            function(*args)
+        except Exception:
+            logger.exception('%s%r failed', function.__name__, args)
+        finally:
+            connections.close_all()
+
+
+pool = DeletionPool()
+
+
+def release_later(names):
+    '''Cleans the files up in the pool once the transaction commits.'''
+    transaction.on_commit(lambda: pool.submit(cleanup_files, names))
+
+
+def delete_user_later(user):
+    '''Deactivates a user at once and deletes them in the background.'''
+    User.objects.filter(pk=user.pk).update(is_active=False)
+    Progress(user.pk).save()
+    transaction.on_commit(lambda: pool.submit(delete_user, user.pk))
@@ -1,6 +1,10 @@
 from django import forms
+from django.db import transaction
 from django.forms import ModelForm
 
+from .deletion import release_later
+from .images import (POST_IMAGE, discard_unreferenced, save_processed,
+                     validate_image_upload, variant_names)
 from .models import Post
 
 
@@ -15,6 +19,41 @@ class PostForm(ModelForm):
             'image': 'Загрузите картинку',
         }
 
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if image and 'image' in self.changed_data:
+            validate_image_upload(image)
+        return image
+
+    def save(self, commit=True):
+        # feeds show the srcset variants, no thumbnail is made for them
+        image = self.cleaned_data.get('image')
+        replaced = []
+        written = []
+        try:
+            with transaction.atomic():
+                if 'image' in self.changed_data:
+                    old = self.initial.get('image')
+                    if old:
+                        replaced = [old.name, *variant_names(
+                            self.instance.image_variants)]
+                    self.instance.image_variants = save_processed(
+                        self.instance.image, image,
+                        POST_IMAGE) if image else {}
+                    if image:
+                        written = [self.instance.image.name, *variant_names(
+                            self.instance.image_variants)]
+                post = super().save(commit)
+        except Exception:
+            # the references of the new files went with the transaction
+            discard_unreferenced(written)
+            raise
+        if commit and replaced:
+            # the storage counts references, the replaced file may be
+            # shared with other posts
+            release_later(replaced)
+        return post
+
 
 class CommentForm(forms.Form):
     parent_comment = forms.IntegerField(
@@ -0,0 +1,135 @@
+import io
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+ImageSpec = namedtuple('ImageSpec', 'max_size widths square')
+
+# the stored original is capped at max_size, the srcset has these widths
+POST_IMAGE = ImageSpec(max_size=2048, widths=(480, 960, 1440), square=False)
+AVATAR_IMAGE = ImageSpec(max_size=512, widths=(80, 160, 320), square=True)
+# comment and admin lists show avatars at 40 to 50 pixels, 2x screens too
+AVATAR_LIST_WIDTH = 80
+
+# newest formats first, a browser takes the first <source> it supports
+VARIANT_FORMATS = [
+    (name, f'image/{name}') for name in ('avif', 'webp')
+    if features.check(name)]
+VARIANTS_DIR = 'variants'
+
+
+def image_size(file):
+    '''Width and height read from the header, the pixels are not decoded.'''
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return image.size
+    finally:
+        file.seek(0)
+
+
+def validate_image_upload(file):
+    if file.size > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'The image is larger than %(limit)d MB.',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_BYTES // 2 ** 20},
+            code='image_too_large')
+    width, height = image_size(file)
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'The image has more than %(limit)d megapixels.',
+            params={'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 10 ** 6},
+            code='image_too_many_pixels')
+
+
+def decode(file, spec):
+    '''Decodes an upload once, upright, in RGB and at most max_size.'''
+    file.seek(0)
+    with Image.open(file) as image:
+        # JPEG decodes at 1/2, 1/4 or 1/8 scale for free
+        image.draft('RGB', (spec.max_size, spec.max_size))
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ('RGBA', 'LA', 'P'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    if spec.square:
+        side = min(min(image.size), spec.max_size)
+        return ImageOps.fit(image, (side, side), Image.LANCZOS)
+    image.thumbnail((spec.max_size, spec.max_size), Image.LANCZOS)
+    return image
+
+
+def encode(image, format):
+    content = io.BytesIO()
+    image.save(content, format, quality=settings.IMAGE_QUALITY)
+    return ContentFile(content.getvalue())
+
+
+def save_processed(field_file, upload, spec):
+    '''Stores a re-encoded upload in field_file and its srcset variants.
+
+    The original is kept as a JPEG no larger than spec.max_size, the
+    variants are made from it in every format Pillow can write. Returns
+    the variant metadata to store on the model.
+    '''
+    image = decode(upload, spec)
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    # the directory of the field, the storage may name the file by content
+    directory = os.path.dirname(field_file.field.generate_filename(
+        field_file.instance, f'{stem}.jpg'))
+    field_file.save(f'{stem}.jpg', encode(image, 'JPEG'), save=False)
+    stem = os.path.splitext(os.path.basename(field_file.name))[0]
+    widths = sorted({min(width, image.width) for width in spec.widths})
+    sources = []
+    for format, mime in VARIANT_FORMATS:
+        srcset = []
+        for width in widths:
+            variant = image.resize(
+                (width, round(image.height * width / image.width)),
+                Image.LANCZOS) if width < image.width else image
+            srcset.append([default_storage.save(
+                os.path.join(directory, VARIANTS_DIR,
+                             f'{stem}-{width}.{format}'),
+                encode(variant, format.upper())), width])
+        sources.append({'type': mime, 'srcset': srcset})
+    return {'width': image.width, 'height': image.height, 'sources': sources}
+
+
+def variant_names(variants):
+    return [name for source in (variants or {}).get('sources', ())
+            for name, _ in source['srcset']]
+
+
+def variant_url(variants, width):
+    '''URL of a variant at least width wide, for an <img> without srcset.
+
+    The formats go newest first, so the last one is the most widely
+    supported. None if the image has no variants.
+    '''
+    sources = (variants or {}).get('sources')
+    if not sources:
+        return None
+    srcset = sources[-1]['srcset']
+    name = next((name for name, size in srcset if size >= width),
+                srcset[-1][0])
+    return default_storage.url(name)
+
+
+def discard_unreferenced(names):
+    '''Deletes the files of a rolled back save that nothing refers to.
+
+    Their references went with the transaction; a file stored before for
+    another row keeps its references and stays.
+    '''
+    for name in names:
+        if default_storage.references(name) is None:
+            default_storage.delete(name)
@@ -0,0 +1,312 @@
+import cProfile
+import logging
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.template.backends.django import DjangoTemplates, Template
+from django.urls import Resolver404, resolve
+from django.utils.connection import ConnectionProxy
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+cache = ConnectionProxy(caches, 'stats')
+
+CONFIG_KEY = 'instrumentation:config'
+SERIES_KEY = 'metrics:series'
+METRIC_KEY = 'metrics:{}:{}'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# sums are kept in the cache as integers, in microseconds
+SUM_SCALE = 1000000
+
+
+class Switch:
+    '''Instrumentation settings shared by every worker through the cache.
+
+    Each process rereads them once per INSTRUMENTATION_REFRESH seconds, so
+    a request only compares two numbers while instrumentation is off.
+    '''
+
+    def __init__(self):
+        self.metrics = False
+        self.profile_rate = 0.0
+        self.profile_views = frozenset()
+        self.active = False
+        self._expires = 0.0
+
+    def defaults(self):
+        return {'metrics': settings.INSTRUMENTATION_METRICS,
+                'profile_rate': settings.PROFILE_RATE,
+                'profile_views': settings.PROFILE_VIEWS}
+
+    def config(self):
+        return cache.get(CONFIG_KEY) or self.defaults()
+
+    def refresh(self):
+        if time.monotonic() < self._expires:
+            return self
+        config = self.config()
+        self.metrics = config['metrics']
+        self.profile_rate = config['profile_rate']
+        self.profile_views = frozenset(config['profile_views'])
+        self.active = self.metrics or self.profile_rate > 0
+        self._expires = time.monotonic() + settings.INSTRUMENTATION_REFRESH
+        return self
+
+    def set(self, **config):
+        '''Changes the settings of every worker, returns the new ones.'''
+        config = {**self.config(), **config}
+        cache.set(CONFIG_KEY, config, None)
+        self._expires = 0.0
+        return config
+
+    def reset(self):
+        cache.delete(CONFIG_KEY)
+        self._expires = 0.0
+
+
+switch = Switch()
+
+
+class Metrics:
+    '''Latency histograms in the Prometheus sense.
+
+    Observations are summed up in the process and added to shared cache
+    counters by a timer thread once per METRICS_FLUSH_INTERVAL seconds, so
+    the exporter of any worker reports the whole site and no measured
+    request waits for the cache. With METRICS_FLUSH_INTERVAL = 0 every
+    observation is added right away.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(int)
+        self._timer = None
+
+    def observe(self, name, labels, seconds):
+        series = (name, tuple(sorted(labels.items())))
+        bucket = bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self._pending[series, bucket] += 1
+            self._pending[series, 'sum'] += round(seconds * SUM_SCALE)
+            if settings.METRICS_FLUSH_INTERVAL and self._timer is None:
+                self._timer = threading.Thread(
+                    target=self.run, name='metrics', daemon=True)
+                self._timer.start()
+        if not settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def run(self):
+        while True:
+            time.sleep(max(settings.METRICS_FLUSH_INTERVAL, 1))
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing metrics failed')
+            finally:
+                connections.close_all()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(int)
+        if not pending:
+            return
+        series = {key[0] for key in pending}
+        # the index may lose a racing update, the next flush restores it
+        known = cache.get(SERIES_KEY, set())
+        if not series <= known:
+            cache.set(SERIES_KEY, known | series, None)
+        for (name_labels, field), value in pending.items():
+            key = metric_key(name_labels, field)
+            try:
+                cache.incr(key, value)
+            except ValueError:
+                if not cache.add(key, value, None):
+                    cache.incr(key, value)
+
+
+metrics = Metrics()
+
+
+def metric_key(series, field):
+    name, labels = series
+    return METRIC_KEY.format(
+        name, ','.join(f'{label}={value}' for label, value in labels)
+        + f':{field}')
+
+
+def format_labels(labels, **extra):
+    labels = [*labels, *extra.items()]
+    return '{%s}' % ','.join(
+        '%s="%s"' % (label, str(value).replace('\\', r'\\').replace(
+            '"', r'\"')) for label, value in labels)
+
+
+def export():
+    '''The shared histograms in the Prometheus text format.'''
+    metrics.flush()
+    series = sorted(cache.get(SERIES_KEY, set()))
+    fields = list(range(len(BUCKETS) + 1)) + ['sum']
+    values = cache.get_many(
+        [metric_key(item, field) for item in series for field in fields])
+    lines = []
+    for name in sorted({name for name, _ in series}):
+        lines.append(f'# TYPE {name} histogram')
+        for item in (item for item in series if item[0] == name):
+            _, labels = item
+            total = 0
+            for bucket, bound in enumerate((*BUCKETS, '+Inf')):
+                total += values.get(metric_key(item, bucket), 0)
+                lines.append(f'{name}_bucket'
+                             f'{format_labels(labels, le=bound)} {total}')
+            seconds = values.get(metric_key(item, 'sum'), 0) / SUM_SCALE
+            lines.append(f'{name}_sum{format_labels(labels)} {seconds}')
+            lines.append(f'{name}_count{format_labels(labels)} {total}')
+    return '\n'.join(lines) + '\n'
+
+
+class Timings:
+    '''Time spent in each span during one request.'''
+
+    def __init__(self, view):
+        self.view = view
+        self.spans = defaultdict(float)
+
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def span(name):
+    '''Times a block for the request histograms and Server-Timing header.
+
+    Does nothing while metrics are off.
+    '''
+    if not switch.refresh().metrics:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timings = current_timings.get()
+        if timings is not None:
+            timings.spans[name] += elapsed
+        metrics.observe('yatube_span_seconds', {
+            'span': name,
+            'view': timings.view if timings is not None else ''}, elapsed)
+
+
+def time_query(execute, sql, params, many, context):
+    with span('db'):
+        return execute(sql, params, many, context)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with span('template'):
+            return super().render(context, request)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    '''Django templates whose rendering is timed as the template span.
+
+    Only the templates a view renders are timed, includes are part of them.
+    '''
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(
+            super().get_template(template_name).template, self)
+
+
+def view_name(request):
+    try:
+        return resolve(request.path_info).view_name
+    except Resolver404:
+        return ''
+
+
+class InstrumentationMiddleware:
+    '''Request latency histograms, Server-Timing and sampled profiles.
+
+    Switched on and off at runtime with the instrument management command.
+    Profiles of a sampled request are written by cProfile to PROFILE_DIR,
+    one file per request, named after the view.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not switch.refresh().active:
+            return self.get_response(request)
+        view = view_name(request)
+        profiler = None
+        if (switch.profile_rate and random.random() < switch.profile_rate
+                and (not switch.profile_views
+                     or view in switch.profile_views)):
+            profiler = cProfile.Profile()
+        timings = Timings(view)
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                if switch.metrics:
+                    for connection in connections.all():
+                        stack.enter_context(
+                            connection.execute_wrapper(time_query))
+                if profiler is not None:
+                    profiler.enable()
+                    stack.callback(profiler.disable)
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        elapsed = time.perf_counter() - start
+        if profiler is not None:
+            self.save_profile(profiler, view)
+        if switch.metrics:
+            metrics.observe('yatube_request_seconds', {
+                'view': view, 'method': request.method,
+                'status': f'{response.status_code // 100}xx'}, elapsed)
+            response['Server-Timing'] = ', '.join(
+                f'{name};dur={seconds * 1000:.1f}'
+                for name, seconds in (*timings.spans.items(),
+                                      ('total', elapsed)))
+        return response
+
+    def save_profile(self, profiler, view):
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        profiler.dump_stats(os.path.join(
+            settings.PROFILE_DIR,
+            f'{view.replace(":", "-") or "unknown"}-{time.time_ns()}.prof'))
+
+
+def metrics_view(request):
+    '''Prometheus scrape target, for the METRICS_TOKEN bearer token only.
+
+    There is no page without a token: behind a reverse proxy every client
+    comes from the proxy's address, so the address tells nothing.
+    '''
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    if not constant_time_compare(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}'):
+        return HttpResponseForbidden()
+    return HttpResponse(export(),
+                        content_type='text/plain; version=0.0.4')
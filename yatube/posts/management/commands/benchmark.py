@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import compare, load_baseline, run, save_baseline
+
+ROW = '{:<18} {:>8} {:>10} {:>10} {:>12}'
+
+
+class Command(BaseCommand):
+    help = ('Measures queries, latency and memory of the posts views and '
+            'compares them with the stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*',
+                            help='Names of the scenarios to run, all if none')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--baseline', default=settings.BENCHMARK_BASELINE)
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Allowed growth of p95 and memory')
+        parser.add_argument('--save', action='store_true',
+                            help='Store the results as the new baseline')
+
+    def handle(self, *args, **options):
+        try:
+            results = run(options['repeat'], options['warmup'],
+                          options['scenarios'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(ROW.format(
+            'scenario', 'queries', 'p50 ms', 'p95 ms', 'memory KiB'))
+        for name, result in results.items():
+            self.stdout.write(ROW.format(
+                name, result['queries'], result['p50'], result['p95'],
+                result['memory']))
+        if options['save']:
+            baseline = load_baseline(options['baseline']) or {}
+            save_baseline(options['baseline'], {**baseline, **results})
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+        baseline = load_baseline(options['baseline'])
+        if baseline is None:
+            self.stdout.write('No baseline to compare with, run with --save')
+            return
+        regressions = compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Regressions:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
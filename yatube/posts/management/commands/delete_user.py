@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.deletion import delete_user
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Deletes a user with their posts, comments and follows in '
+            'batches, reporting progress')
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f"No user {options['username']}")
+
+        def report(state):
+            self.stdout.write(f"{state['stage']}: " + ', '.join(
+                f'{count} {name}' for name, count in state['deleted'].items()))
+
+        delete_user(user.pk, options['batch_size'], report)
+        self.stdout.write(f'{user.username} deleted')
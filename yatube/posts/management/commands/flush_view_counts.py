@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import request_flush
+
+
+class Command(BaseCommand):
+    help = 'Has every worker write its buffered post views to Post.counter'
+
+    def handle(self, *args, **options):
+        request_flush()
+        self.stdout.write('Asked the workers to flush their post views')
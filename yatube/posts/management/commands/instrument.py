@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from posts.instrumentation import switch
+
+
+class Command(BaseCommand):
+    help = ('Switches request metrics and sampled profiling on every worker, '
+            'without a restart')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--metrics', choices=('on', 'off'))
+        parser.add_argument('--profile-rate', type=float,
+                            help='Share of requests to profile, 0 to stop')
+        parser.add_argument('--profile-view', action='append',
+                            dest='profile_views', metavar='VIEW_NAME',
+                            help='Only profile this view, may be repeated')
+        parser.add_argument('--all-views', action='store_true',
+                            help='Profile every view again')
+        parser.add_argument('--reset', action='store_true',
+                            help='Go back to the values from settings')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            switch.reset()
+        changes = {}
+        if options['metrics']:
+            changes['metrics'] = options['metrics'] == 'on'
+        if options['profile_rate'] is not None:
+            changes['profile_rate'] = min(max(options['profile_rate'], 0), 1)
+        if options['profile_views'] or options['all_views']:
+            changes['profile_views'] = options['profile_views'] or []
+        config = switch.set(**changes) if changes else switch.config()
+        views = ', '.join(config['profile_views']) or 'all views'
+        self.stdout.write(
+            f"Metrics {'on' if config['metrics'] else 'off'}, profiling "
+            f"{config['profile_rate']:.1%} of requests to {views}")
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized follow timelines from scratch'
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write('Timelines rebuilt')
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmark import run_templates
+
+ROW = '{:<14} {:>14} {:>12} {:>8}'
+
+
+class Command(BaseCommand):
+    help = ('Compares the render time of the feed pages with and without '
+            'the cached template loader')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            results = run_templates(options['repeat'], options['warmup'])
+        except ValueError as error:
+            raise CommandError(error)
+        self.stdout.write(ROW.format(
+            'template', 'uncached p50', 'cached p50', 'speedup'))
+        for name, result in results.items():
+            uncached = result['uncached']['p50']
+            cached = result['cached']['p50']
+            self.stdout.write(ROW.format(
+                name, f'{uncached:.2f} ms', f'{cached:.2f} ms',
+                f'{uncached / cached:.1f}x'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.services import recount_comments
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Post.comment_count from the comments table'
+
+    def handle(self, *args, **options):
+        updated = recount_comments()
+        self.stdout.write(f'Recounted comments of {updated} posts')
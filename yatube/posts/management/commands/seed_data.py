@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = 'Fills the database with synthetic users, posts and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--avatars', type=int, default=8,
+                            help='Distinct avatar images to share')
+        parser.add_argument('--max-follows', type=int, default=50)
+        parser.add_argument('--max-depth', type=int, default=8,
+                            help='Deepest level of a comment thread')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int,
+                            help='Random seed, for a repeatable data set')
+
+    def handle(self, *args, **options):
+        created = Seeder(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            avatars=options['avatars'], max_follows=options['max_follows'],
+            max_depth=options['max_depth'],
+            batch_size=options['batch_size'], seed=options['seed']).run()
+        self.stdout.write(', '.join(
+            f'{count} {model}' for model, count in created.items())
+            + ' created')
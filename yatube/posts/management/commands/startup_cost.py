@@ -0,0 +1,92 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Run in a fresh interpreter, as the worker of a profile would start.
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+configured = time.perf_counter()
+django.setup()
+ready = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import get_resolver
+WSGIHandler()
+get_resolver().url_patterns
+loaded = time.perf_counter()
+print(json.dumps({
+    'settings': configured - start, 'apps': ready - configured,
+    'handler': loaded - ready, 'modules': len(sys.modules)}))
+'''
+ROW = '{:<8} {:>10} {:>10} {:>10} {:>10} {:>8}'
+
+
+def parse_importtime(log):
+    '''Self time of every module in microseconds, from -X importtime.'''
+    times = {}
+    for line in log.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        if self_time.strip().isdigit():
+            times[name.strip()] = int(self_time)
+    return times
+
+
+def probe(profile):
+    env = {**os.environ, 'SETTINGS_PROFILE': profile,
+           'DJANGO_SETTINGS_MODULE': os.environ.get(
+               'DJANGO_SETTINGS_MODULE', 'yatube.settings')}
+    process = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    if process.returncode:
+        raise CommandError(f'{profile} profile failed to start:\n'
+                           f'{process.stderr[-2000:]}')
+    result = json.loads(process.stdout.splitlines()[-1])
+    result['imports'] = parse_importtime(process.stderr)
+    return result
+
+
+class Command(BaseCommand):
+    help = ('Measures how long a worker of each settings profile takes to '
+            'import its modules and fill the app registry')
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*',
+                            default=['dev', 'test', 'prod'])
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Interpreters started per profile, the '
+                                 'median is reported')
+        parser.add_argument('--top', type=int, default=10,
+                            help='Slowest modules to list per profile')
+
+    def handle(self, *args, **options):
+        self.stdout.write(ROW.format(
+            'profile', 'settings', 'apps', 'handler', 'total ms', 'modules'))
+        slowest = {}
+        for profile in options['profiles']:
+            runs = [probe(profile) for _ in range(max(options['repeat'], 1))]
+            median = {
+                stage: statistics.median(run[stage] for run in runs) * 1000
+                for stage in ('settings', 'apps', 'handler')}
+            self.stdout.write(ROW.format(
+                profile, *(f'{median[stage]:.1f}' for stage in median),
+                f'{sum(median.values()):.1f}', runs[0]['modules']))
+            imports = runs[-1]['imports']
+            slowest[profile] = sorted(
+                imports.items(), key=lambda item: item[1],
+                reverse=True)[:options['top']]
+        for profile, modules in slowest.items():
+            self.stdout.write(f'\nSlowest imports of {profile}, self time:')
+            for module, microseconds in modules:
+                self.stdout.write(
+                    f'  {module:<50} {microseconds / 1000:.1f} ms')
@@ -0,0 +1,93 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .routers import RequestState, request_state
+
+logger = logging.getLogger('posts.queries')
+
+STICKY_COOKIE = 'primary_reads'
+
+
+class ReplicaStickinessMiddleware:
+    '''Keeps a client on the primary for a while after it writes.
+
+    Replicas lag behind the primary, so a new post, comment or follow would
+    otherwise be missing from the page the client is redirected to.
+    '''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RequestState(sticky=STICKY_COOKIE in request.COOKIES)
+        token = request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_state.reset(token)
+        if state.wrote and settings.REPLICA_DATABASES:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax')
+        return response
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(queries):
+    '''Sets the number of queries a view may run instead of QUERY_BUDGET.'''
+    def decorator(view):
+        view.query_budget = queries
+        return view
+    return decorator
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.duration += time.perf_counter() - start
+
+
+class QueryBudgetMiddleware:
+    '''Counts the queries of a request and reports views over budget.'''
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        budget = getattr(request, 'query_budget', settings.QUERY_BUDGET)
+        message = '%s %s ran %d queries in %.1f ms'
+        args = (request.method, request.path, counter.queries,
+                counter.duration * 1000)
+        if counter.queries <= budget:
+            logger.debug(message, *args)
+            return response
+        if settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceeded(
+                (message + ', budget is %d') % (*args, budget))
+        logger.warning(message + ', budget is %d', *args, budget)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        budget = getattr(view_func, 'query_budget', None)
+        if budget is not None:
+            request.query_budget = budget
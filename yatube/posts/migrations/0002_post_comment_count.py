@@ -0,0 +1,30 @@
+# Generated by Django 3.2.7 on 2026-10-18 02:46
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_comments(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    comment_count = Comment.objects.filter(
+        post=OuterRef('pk')).order_by().values('post').annotate(
+            count=Count('pk')).values('count')
+    Post.objects.update(comment_count=Coalesce(Subquery(comment_count), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_comments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2.7 on 2026-10-18 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0002_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-post'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'post'), name='unique_timeline_entry'),
+        ),
+        migrations.RunSQL(
+            '''
+            INSERT INTO posts_timelineentry (user_id, post_id, pub_date)
+            SELECT follow.user_id, post.id, post.pub_date
+            FROM posts_follow follow
+            JOIN posts_post post ON post.author_id = follow.author_id
+            ON CONFLICT (user_id, post_id) DO NOTHING
+            ''',
+            migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.7 on 2026-10-18 02:50
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0003_timelineentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(django.db.models.expressions.F('post'), django.db.models.expressions.F('path__0'), django.db.models.expressions.F('path'), name='comment_thread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['path'], name='comment_path_gin_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:01
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0006_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunSQL(
+            '''
+            CREATE FUNCTION posts_post_search_vector() RETURNS trigger AS $$
+            BEGIN
+                NEW.search_vector := to_tsvector(
+                    'pg_catalog.russian', coalesce(NEW.text, ''));
+                RETURN NEW;
+            END
+            $$ LANGUAGE plpgsql;
+            CREATE TRIGGER posts_post_search_vector
+                BEFORE INSERT OR UPDATE ON posts_post
+                FOR EACH ROW EXECUTE FUNCTION posts_post_search_vector();
+            UPDATE posts_post
+            SET search_vector = to_tsvector('pg_catalog.russian', text);
+            ''',
+            '''
+            DROP TRIGGER posts_post_search_vector ON posts_post;
+            DROP FUNCTION posts_post_search_vector();
+            ''',
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='post_search_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0007_post_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='date updated'),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(
+            'UPDATE posts_comment SET updated = created',
+            migrations.RunSQL.noop,
+        ),
+    ]
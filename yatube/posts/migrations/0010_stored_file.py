@@ -0,0 +1,20 @@
+# Generated by Django 3.2.7 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('references', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
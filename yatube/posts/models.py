@@ -1,3 +1,4 @@
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser
@@ -6,6 +7,8 @@ from django.db import models
 from django.db.models import UniqueConstraint
 from django.db.models import Q
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class ROLE_CHOICES(models.TextChoices):
@@ -43,6 +46,9 @@ class User(AbstractUser):
         upload_to='avatars/',
         help_text='Choose the avatar',
         blank=True, null=True)
+    # srcset variants of the avatar, see posts.images
+    avatar_variants = models.JSONField(default=dict, blank=True,
+                                       editable=False)
     REQUIRED_FIELDS = ['email']
 
     class Meta:
@@ -71,8 +77,11 @@ class User(AbstractUser):
         return '/media/avatars/default-1.png'
 
     def avatar_tag(self):
+        # lists resolve the avatars of a page at once, see posts.avatars
+        avatar = getattr(self, 'resolved_avatar', None)
+        url = (avatar.thumbnail or avatar.url) if avatar else self.get_avatar()
         return mark_safe(
-            '<img src="%s" width="50" height="50" />' % self.get_avatar())
+            '<img src="%s" width="50" height="50" />' % escape(url))
     avatar_tag.short_description = 'avatar'
 
 
@@ -85,18 +94,51 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        '''Posts with everything a feed card shows, as one query.'''
+        return self.select_related('author', 'group')
+
+
+class PostManager(models.Manager.from_queryset(PostQuerySet)):
+    def get_queryset(self):
+        # the search vector is only needed by filters, never on a page
+        return super().get_queryset().defer('search_vector')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField('date published', auto_now_add=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
+    # author and group are indexed together with pub_date in Meta.indexes
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='posts')
+                               related_name='posts', db_index=False)
     group = models.ForeignKey(Group, on_delete=models.SET_NULL, blank=True,
-                              null=True, related_name='posts')
+                              null=True, related_name='posts',
+                              db_index=False)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # srcset variants of the image, see posts.images
+    image_variants = models.JSONField(default=dict, blank=True,
+                                      editable=False)
     counter = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    # filled from text by a database trigger, see posts.search
+    search_vector = SearchVectorField(null=True, blank=True, editable=False)
+
+    objects = PostManager()
 
     class Meta:
         ordering = ['-pub_date']
+        # every feed is read newest first, with the id breaking ties
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+            GinIndex(fields=['search_vector'], name='post_search_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -104,15 +146,29 @@ class Post(models.Model):
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='comments')
     text = models.TextField(max_length=500)
     created = models.DateTimeField('date published', auto_now_add=True)
+    # when the comment was last edited, as the API shows it
+    updated = models.DateTimeField('date updated', auto_now=True)
     path = ArrayField(models.IntegerField())
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            # threads of a post are fetched by their root id, in path order
+            models.Index(models.F('post'), models.F('path__0'),
+                         models.F('path'), name='comment_thread_idx'),
+            # top-level comments of a post, for paging threads
+            models.Index(fields=['post', 'path'],
+                         condition=models.Q(path__len=1),
+                         name='comment_root_idx'),
+            models.Index(fields=['post', '-created'],
+                         name='comment_post_created_idx'),
+            GinIndex(fields=['path'], name='comment_path_gin_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -128,11 +184,42 @@ class Follow(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name='follower')
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='following')
+                               related_name='following', db_index=False)
 
     class Meta:
         constraints = [UniqueConstraint(fields=['user', 'author'],
                                         name='unique_subscription')]
+        # followers of an author are read by fan-out without the table
+        indexes = [models.Index(fields=['author', 'user'],
+                                name='follow_author_user_idx')]
 
     def __str__(self) -> str:
         return f"{self.user} follows {self.author}"
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='timeline')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='timeline_entries')
+    # copy of post.pub_date, so a follow feed is one range scan of the index
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [UniqueConstraint(fields=['user', 'post'],
+                                        name='unique_timeline_entry')]
+        indexes = [models.Index(fields=['user', '-pub_date', '-post'],
+                                name='timeline_user_pub_date_idx')]
+
+    def __str__(self) -> str:
+        return f"{self.post} in {self.user}'s timeline"
+
+
+class StoredFile(models.Model):
+    '''A file of the content addressed media storage, see posts.storage.'''
+    name = models.CharField(max_length=255, primary_key=True)
+    # model fields and variants pointing at the file, it goes at zero
+    references = models.PositiveIntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.references})'
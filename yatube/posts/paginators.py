@@ -0,0 +1,121 @@
+import binascii
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections.abc import Sequence
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(direction, value, pk):
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{direction}|{value}|{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    '''Returns (direction, value, pk) or None for a malformed cursor.'''
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        direction, value, pk = raw.split('|')
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return direction, value, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class CursorPage(Sequence):
+    is_cursor = True
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} posts>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    '''Keyset paginator over rows ordered by (-field, -id), newest first.
+
+    Unlike Paginator it never counts the rows or uses OFFSET, so every page
+    costs one indexed query no matter how deep it is. field may name an
+    annotation of object_list as well as a model field.
+    '''
+
+    def __init__(self, object_list, per_page, field='pub_date'):
+        self.object_list = object_list
+        self.per_page = per_page
+        self.field = field
+
+    def position(self, cursor):
+        position = decode_cursor(cursor) if cursor else None
+        if position is None:
+            return None
+        direction, value, pk = position
+        annotation = self.object_list.query.annotations.get(self.field)
+        if annotation is not None:
+            field = annotation.output_field
+        else:
+            field = self.object_list.model._meta.get_field(self.field)
+        try:
+            return direction, field.to_python(value), pk
+        except ValidationError:
+            return None
+
+    def get_page(self, cursor):
+        position = self.position(cursor)
+        field = self.field
+        if position is None:
+            posts = self._fetch(self.object_list, f'-{field}', '-id')
+            return self._page(posts, has_next=len(posts) > self.per_page,
+                              has_previous=False)
+        direction, value, pk = position
+        if direction == NEXT:
+            older = self.object_list.filter(
+                Q(**{f'{field}__lt': value})
+                | Q(**{field: value, 'id__lt': pk}))
+            posts = self._fetch(older, f'-{field}', '-id')
+            return self._page(posts, has_next=len(posts) > self.per_page,
+                              has_previous=True)
+        newer = self.object_list.filter(
+            Q(**{f'{field}__gt': value})
+            | Q(**{field: value, 'id__gt': pk}))
+        posts = self._fetch(newer, field, 'id')
+        has_previous = len(posts) > self.per_page
+        return self._page(posts[:self.per_page][::-1], has_next=True,
+                          has_previous=has_previous)
+
+    def _fetch(self, posts, *ordering):
+        return list(posts.order_by(*ordering)[:self.per_page + 1])
+
+    def cursor(self, direction, row):
+        return encode_cursor(direction, getattr(row, self.field), row.pk)
+
+    def _page(self, posts, has_next, has_previous):
+        posts = posts[:self.per_page]
+        return CursorPage(
+            posts, self,
+            self.cursor(NEXT, posts[-1]) if has_next and posts else None,
+            self.cursor(PREVIOUS, posts[0])
+            if has_previous and posts else None)
@@ -0,0 +1,67 @@
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RequestState:
+    '''What the router knows about the request being served.'''
+
+    def __init__(self, sticky):
+        # a client that wrote recently reads its own writes from the primary
+        self.sticky = sticky
+        self.replica = None
+        self.read_only = False
+        self.wrote = False
+
+
+request_state = ContextVar('request_state', default=None)
+
+
+def replica_reads(view):
+    '''Lets the reads of a view go to a replica.'''
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        state = request_state.get()
+        if state is None or request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+        # writes of a read-only view are bookkeeping, such as generated
+        # thumbnails, and do not pin the client to the primary
+        state.read_only = True
+        if not state.sticky and settings.REPLICA_DATABASES:
+            state.replica = random.choice(settings.REPLICA_DATABASES)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            state.replica = None
+            state.read_only = False
+    return wrapper
+
+
+class ReplicaRouter:
+    '''Sends the reads of replica_reads views to one replica per request.
+
+    Writes, transactions and every other read use the primary.
+    '''
+
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        if (state is None or state.replica is None
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None and not state.read_only:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
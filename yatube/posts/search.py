@@ -0,0 +1,43 @@
+from django.contrib.postgres.search import (SearchHeadline, SearchQuery,
+                                            SearchRank)
+from django.db.models import F
+
+from .models import Post
+
+# The configuration of the posts_post_search_vector trigger (migration 0007).
+SEARCH_CONFIG = 'russian'
+# Matches are marked with control characters, so the headline can be
+# escaped before the marks are turned into HTML.
+START_SEL = '\x02'
+STOP_SEL = '\x03'
+
+
+def search_query(text):
+    return SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+
+
+def search_posts(text, posts=None):
+    '''Posts matching a web search style query, best matches first.
+
+    The rank is only used for ordering, so counting the matches for the
+    paginator does not compute it.
+    '''
+    if posts is None:
+        posts = Post.objects.all()
+    query = search_query(text)
+    return posts.filter(search_vector=query).order_by(
+        SearchRank(F('search_vector'), query).desc(), '-pub_date', '-id')
+
+
+def add_headlines(posts, text):
+    '''Sets post.headline, the text with the matches marked, on a page.'''
+    posts = list(posts)
+    headlines = dict(Post.objects.filter(
+        pk__in=[post.pk for post in posts]).annotate(
+            headline=SearchHeadline(
+                'text', search_query(text), config=SEARCH_CONFIG,
+                start_sel=START_SEL, stop_sel=STOP_SEL,
+                highlight_all=True)).values_list('pk', 'headline'))
+    for post in posts:
+        post.headline = headlines.get(post.pk, post.text)
+    return posts
@@ -0,0 +1,169 @@
+import io
+import random
+from collections import Counter
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from faker import Faker
+from PIL import Image
+
+from .models import Comment, Follow, Group, Post, User
+from .services import recount_comments, reserve_comment_ids
+from .timeline import rebuild_timelines
+
+SEED_PREFIX = 'seed'
+AVATAR_SIZE = (128, 128)
+
+
+class Seeder:
+    '''Fills the database with a synthetic but realistically shaped site.
+
+    Popularity follows a power law: a few authors have most of the
+    followers and write most of the posts, and a few posts get most of the
+    comments. Rows are written with bulk inserts in batches, signals do not
+    fire, so the timelines and comment counts are rebuilt at the end.
+    '''
+
+    def __init__(self, users=100, groups=10, posts=1000, comments=5000,
+                 avatars=8, max_follows=50, max_depth=8, exponent=1.2,
+                 batch_size=1000, seed=None):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.avatars = avatars
+        self.max_follows = max_follows
+        self.max_depth = max_depth
+        self.exponent = exponent
+        self.batch_size = batch_size
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+
+    def zipf_weights(self, count):
+        '''Cumulative weights of ranks 1..count, the first most popular.'''
+        return list(accumulate(
+            rank ** -self.exponent for rank in range(1, count + 1)))
+
+    def pick(self, population, cum_weights, k=1):
+        return self.random.choices(population, cum_weights=cum_weights, k=k)
+
+    def create_avatars(self):
+        '''Saves a few generated avatars shared by all the seeded users.'''
+        names = []
+        for num in range(self.avatars):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            content = io.BytesIO()
+            Image.new('RGB', AVATAR_SIZE, color).save(content, 'JPEG')
+            names.append(default_storage.save(
+                f'avatars/{SEED_PREFIX}-{num}.jpg',
+                ContentFile(content.getvalue())))
+        return names
+
+    def create_users(self, avatars):
+        password = make_password(None)
+        start = User.objects.count()
+        users = [
+            User(username=f'{SEED_PREFIX}{num}',
+                 email=f'{SEED_PREFIX}{num}@example.com',
+                 first_name=self.fake.first_name(),
+                 last_name=self.fake.last_name(),
+                 bio=self.fake.sentence(), is_active=True, password=password,
+                 avatar=self.random.choice(avatars) if avatars else None)
+            for num in range(start, start + self.users)]
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        # every avatar was saved with one reference, the users share them
+        uses = Counter(user.avatar.name for user in users if user.avatar)
+        for name in avatars:
+            if uses[name]:
+                default_storage.retain(name, uses[name] - 1)
+            else:
+                default_storage.delete(name)
+        return users
+
+    def create_groups(self):
+        start = Group.objects.count()
+        groups = [
+            Group(title=self.fake.catch_phrase()[:200],
+                  slug=f'{SEED_PREFIX}-{num}',
+                  description=self.fake.text(max_nb_chars=200))
+            for num in range(start, start + self.groups)]
+        return Group.objects.bulk_create(groups, batch_size=self.batch_size)
+
+    def create_follows(self, users):
+        '''Each user follows a power law sample of the popular authors.'''
+        weights = self.zipf_weights(len(users))
+        follows = []
+        for user in users:
+            count = min(int(self.random.paretovariate(1)),
+                        self.max_follows, len(users) - 1)
+            authors = {author.pk for author in self.pick(
+                users, weights, count)}
+            follows.extend(Follow(user=user, author_id=author)
+                           for author in authors if author != user.pk)
+        return Follow.objects.bulk_create(follows, batch_size=self.batch_size)
+
+    def create_posts(self, users, groups):
+        weights = self.zipf_weights(len(users))
+        posts = [
+            Post(author=author, text=self.fake.text(max_nb_chars=600),
+                 group=self.random.choice(groups) if (
+                     groups and self.random.random() < 0.7) else None)
+            for author in self.pick(users, weights, self.posts)]
+        Post.objects.bulk_create(posts, batch_size=self.batch_size)
+        # publication dates spread over the last year, not all "now"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {Post._meta.db_table} SET pub_date = '
+                "now() - random() * interval '365 days' WHERE id = ANY(%s)",
+                [[post.pk for post in posts]])
+        return posts
+
+    def create_comments(self, users, posts):
+        '''Comments in threads, a reply goes under a recent comment.
+
+        Replying to the latest comments of a thread more often than to old
+        ones makes the deep chains that threaded pages have to render.
+        '''
+        if not posts or not self.comments:
+            return []
+        post_weights = self.zipf_weights(len(posts))
+        threads = {}
+        comments = []
+        ids = reserve_comment_ids(self.comments)
+        for pk, post in zip(ids, self.pick(posts, post_weights,
+                                           self.comments)):
+            thread = threads.setdefault(post.pk, [])
+            parent = None
+            if thread and self.random.random() < 0.7:
+                parent = thread[-min(len(thread), int(
+                    self.random.paretovariate(1)))]
+                if len(parent.path) >= self.max_depth:
+                    parent = None
+            comment = Comment(
+                id=pk, post=post, author=self.random.choice(users),
+                text=self.fake.sentence(),
+                path=(list(parent.path) if parent else []) + [pk])
+            thread.append(comment)
+            comments.append(comment)
+        return Comment.objects.bulk_create(
+            comments, batch_size=self.batch_size)
+
+    def run(self):
+        '''Seeds the database, returns the number of rows by model.'''
+        avatars = self.create_avatars()
+        with transaction.atomic():
+            users = self.create_users(avatars)
+            groups = self.create_groups()
+            follows = self.create_follows(users)
+            posts = self.create_posts(users, groups)
+            comments = self.create_comments(users, posts)
+            recount_comments(Post.objects.filter(
+                pk__in=[post.pk for post in posts]))
+            rebuild_timelines()
+        return {'users': len(users), 'groups': len(groups),
+                'follows': len(follows), 'posts': len(posts),
+                'comments': len(comments)}
@@ -0,0 +1,107 @@
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .caching import invalidate_feeds
+from .models import Comment, Post
+
+# The id is taken from the sequence once and reused for the path, so the
+# row is never visible with an incomplete path.
+CREATE_COMMENT_SQL = '''
+    WITH new AS (
+        SELECT nextval(pg_get_serial_sequence(%(table)s, 'id')) AS id)
+    INSERT INTO {table} (id, path, post_id, author_id, text, created,
+                         updated)
+    SELECT new.id,
+           COALESCE(parent.path, '{{}}') || new.id::integer,
+           %(post)s, %(author)s, %(text)s, %(created)s, %(created)s
+    FROM new
+    LEFT JOIN {table} parent ON parent.id = %(parent)s
+        AND parent.post_id = %(post)s
+    WHERE %(parent)s IS NULL OR parent.id IS NOT NULL
+    RETURNING id, path
+'''
+
+
+def change_comment_count(post_id, delta):
+    Post.objects.filter(pk=post_id).update(
+        comment_count=F('comment_count') + delta)
+    invalidate_feeds()
+
+
+def reserve_comment_ids(count):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, 'id')) "
+            "FROM generate_series(1, %s)",
+            [Comment._meta.db_table, count])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_comment(post, author, text, parent_id=None):
+    '''Creates a comment with its path in a single INSERT.
+
+    Raises Comment.DoesNotExist if parent_id is not a comment of the post.
+    '''
+    now = timezone.now()
+    comment = Comment(post=post, author=author, text=text, created=now,
+                      updated=now)
+    sql = CREATE_COMMENT_SQL.format(
+        table=connection.ops.quote_name(Comment._meta.db_table))
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, {
+                'table': Comment._meta.db_table, 'post': post.id,
+                'author': author.id, 'text': text,
+                'created': comment.created, 'parent': parent_id})
+            row = cursor.fetchone()
+        if row is None:
+            raise Comment.DoesNotExist(
+                f'Comment {parent_id} does not belong to post {post.id}')
+        comment.id, comment.path = row
+        change_comment_count(post.id, 1)
+    return comment
+
+
+def bulk_create_comments(post, comments):
+    '''Imports a list of unsaved comments of a post with three queries.
+
+    A comment may have a parent attribute pointing to a saved comment or to
+    one earlier in the list; its path is built from the parent's.
+    '''
+    comments = list(comments)
+    if not comments:
+        return comments
+    with transaction.atomic():
+        for comment, pk in zip(comments,
+                               reserve_comment_ids(len(comments))):
+            parent = getattr(comment, 'parent', None)
+            comment.id = pk
+            comment.post = post
+            comment.path = (list(parent.path) if parent else []) + [pk]
+        Comment.objects.bulk_create(comments)
+        change_comment_count(post.id, len(comments))
+    return comments
+
+
+def recount_comments(posts=None):
+    '''Recomputes Post.comment_count from the comments table.
+
+    Returns the number of posts updated.
+    '''
+    if posts is None:
+        posts = Post.objects.all()
+    comment_count = Comment.objects.filter(
+        post=OuterRef('pk')).order_by().values('post').annotate(
+            count=Count('pk')).values('count')
+    return posts.update(comment_count=Coalesce(Subquery(comment_count), 0))
+
+
+def delete_comment(comment):
+    '''Deletes a comment together with its replies.'''
+    with transaction.atomic():
+        deleted, _ = Comment.objects.filter(
+            post_id=comment.post_id, path__contains=[comment.id]).delete()
+        change_comment_count(comment.post_id, -deleted)
+    return deleted
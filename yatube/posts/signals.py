@@ -0,0 +1,72 @@
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import invalidate_feeds
+from .deletion import release_later
+from .images import variant_names
+from .models import Follow, Post
+from .stats import invalidate_author_stats
+from .timeline import backfill, fan_out, prune
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    invalidate_feeds()
+    if created:
+        invalidate_author_stats(instance.author_id)
+        fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    invalidate_feeds()
+    invalidate_author_stats(instance.author_id)
+    # delete_posts sends no signals and releases its images itself
+    if instance.image:
+        release_later([instance.image.name,
+                       *variant_names(instance.image_variants)])
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        invalidate_feeds()
+        invalidate_author_stats(instance.user_id, instance.author_id)
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    invalidate_feeds()
+    invalidate_author_stats(instance.user_id, instance.author_id)
+    prune(instance.user_id, instance.author_id)
+
+
+@receiver(request_finished)
+def mark_connections_idle(**kwargs):
+    now = time.monotonic()
+    for connection in connections.all():
+        connection.idle_since = now
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    # persistent connections may have been closed by the server or a pooler
+    # while idle; reconnect instead of failing the first query. Only the
+    # ones idle for DATABASE_HEALTH_CHECK_IDLE seconds are pinged, so busy
+    # workers do not pay a round trip per request
+    if not settings.DATABASE_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        idle = now - getattr(connection, 'idle_since', 0)
+        if (connection.connection is not None
+                and not connection.in_atomic_block
+                and idle >= settings.DATABASE_HEALTH_CHECK_IDLE
+                and not connection.is_usable()):
+            connection.close()
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+from .models import Follow, Post
+
+cache = ConnectionProxy(caches, 'stats')
+
+AUTHOR_STATS_KEY = 'author_stats:{}'
+
+
+def get_author_stats(author_id):
+    '''Returns the cached post, follower and following counts of a user.'''
+    key = AUTHOR_STATS_KEY.format(author_id)
+    stats = cache.get(key)
+    if stats is None:
+        stats = {
+            'posts': Post.objects.filter(author_id=author_id).count(),
+            'followers': Follow.objects.filter(author_id=author_id).count(),
+            'following': Follow.objects.filter(user_id=author_id).count(),
+        }
+        cache.set(key, stats, settings.AUTHOR_STATS_TIMEOUT)
+    return stats
+
+
+def invalidate_author_stats(*author_ids):
+    cache.delete_many([AUTHOR_STATS_KEY.format(pk) for pk in author_ids])
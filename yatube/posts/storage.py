@@ -0,0 +1,99 @@
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+from .models import StoredFile
+
+TEMP_DIR = 'tmp'
+# stored files are readable by the web server, as Django's own are
+DEFAULT_PERMISSIONS = 0o644
+
+RETAIN_SQL = '''
+    INSERT INTO {table} (name, {references}) VALUES (%s, %s)
+    ON CONFLICT (name) DO UPDATE
+    SET {references} = {table}.{references} + EXCLUDED.{references}'''
+RELEASE_SQL = '''
+    UPDATE {table} SET {references} = {references} - 1
+    WHERE name = %s RETURNING {references}'''
+
+
+def stored_sql(sql):
+    quote = connection.ops.quote_name
+    return sql.format(table=quote(StoredFile._meta.db_table),
+                      references=quote('references'))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    '''Keeps every distinct file once, named after its SHA-256.
+
+    The content is hashed while it is streamed to a temporary file, so an
+    upload is read once. Saving a file that is stored already only adds a
+    reference to it, and delete() drops one: the file goes with the last.
+    The directory of the requested name is kept, so uploads still land
+    under posts/ or avatars/. Files stored before have no references row
+    and are deleted at once, as before.
+    '''
+
+    def get_available_name(self, name, max_length=None):
+        # the name is decided by the content in _save
+        return name
+
+    def _save(self, name, content):
+        directory, requested = posixpath.split(name)
+        extension = os.path.splitext(requested)[1].lower()
+        temp_dir = self.path(TEMP_DIR)
+        os.makedirs(temp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(dir=temp_dir, delete=False) as temp:
+            if hasattr(content, 'seek'):
+                content.seek(0)
+            for chunk in content.chunks():
+                digest.update(chunk)
+                temp.write(chunk)
+        key = digest.hexdigest()
+        name = posixpath.join(directory, key[:2], key + extension)
+        try:
+            os.chmod(temp.name, self.file_permissions_mode
+                     or DEFAULT_PERMISSIONS)
+            # counted before the file is in place, so a delete racing with
+            # this save keeps its row locked until the reference is there
+            self.retain(name)
+            path = self.path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # a copy with the same content may be replaced safely
+            os.replace(temp.name, path)
+        finally:
+            if os.path.exists(temp.name):
+                os.unlink(temp.name)
+        return name
+
+    def retain(self, name, count=1):
+        '''Adds references to a stored file.'''
+        with connection.cursor() as cursor:
+            cursor.execute(stored_sql(RETAIN_SQL), [name, count])
+
+    def references(self, name):
+        return StoredFile.objects.filter(name=name).values_list(
+            'references', flat=True).first()
+
+    def release(self, name):
+        '''Drops a reference, returns whether the file was deleted.'''
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(stored_sql(RELEASE_SQL), [name])
+                row = cursor.fetchone()
+            if row is not None and row[0] > 0:
+                return False
+            if row is not None:
+                StoredFile.objects.filter(name=name).delete()
+            super().delete(name)
+        return True
+
+    def delete(self, name):
+        self.release(name)
@@ -0,0 +1,30 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from ..caching import cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+    def __init__(self, nodelist):
+        self.nodelist = nodelist
+
+    def render(self, context):
+        key = context.get('feed_cache_key')
+        if key is None:
+            return self.nodelist.render(context)
+        cache_key = make_template_fragment_key('feed', [key])
+        value = cache.get(cache_key)
+        if value is None:
+            value = self.nodelist.render(context)
+            cache.set(cache_key, value, context['feed_cache_timeout'])
+        return value
+
+
+@register.tag
+def feedcache(parser, token):
+    '''Caches the enclosed feed for anonymous visitors, see feed_page().'''
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist)
@@ -0,0 +1,37 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html, format_html_join
+from posts.thumbnails import attach_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(image, variants, sizes='100vw', css_class='', style=''):
+    '''A <picture> choosing among the srcset variants of an image.
+
+    The re-encoded original is the fallback of browsers that take none of
+    the variant formats.
+    '''
+    sources = format_html_join('', '<source type="{}" srcset="{}" sizes="{}">',
+                               ((source['type'], ', '.join(
+                                   f'{default_storage.url(name)} {width}w'
+                                   for name, width in source['srcset']),
+                                 sizes) for source in variants['sources']))
+    return format_html(
+        '<picture>{}<img class="{}" style="{}" src="{}" width="{}" '
+        'height="{}" loading="lazy" alt=""></picture>',
+        sources, css_class, style, image.url, variants['width'],
+        variants['height'])
+
+
+@register.simple_tag
+def feed_thumbnail(post):
+    '''The thumbnail of a post uploaded before the srcset variants.
+
+    Feed pages look them up for the whole page, see attach_thumbnails, a
+    post rendered alone looks its own up.
+    '''
+    if not hasattr(post, 'feed_thumbnail'):
+        attach_thumbnails([post])
+    return post.feed_thumbnail
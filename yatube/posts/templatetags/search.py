@@ -0,0 +1,14 @@
+from django import template
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from ..search import START_SEL, STOP_SEL
+
+register = template.Library()
+
+
+@register.filter
+def highlight(headline):
+    '''Escapes a search headline and wraps the matches in <mark>.'''
+    return mark_safe(escape(headline).replace(
+        START_SEL, '<mark>').replace(STOP_SEL, '</mark>'))
@@ -0,0 +1,31 @@
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from posts.counters import view_counter
+
+
+class PostsTestCase(TestCase):
+    '''Starts every test with empty caches and keeps the files of a test
+    case in a MEDIA_ROOT of its own.
+
+    Neither the caches nor the stored files are rolled back with the
+    database after a test. Buffered post views are written before the
+    rollback, so none are left for the flush at exit.
+    '''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        media_root = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        cls.addClassCleanup(media.disable)
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.addCleanup(view_counter.flush)
+        for cache in caches.all():
+            cache.clear()
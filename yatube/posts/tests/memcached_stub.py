@@ -0,0 +1,135 @@
+'''A small in-process server speaking the memcached text protocol.
+
+It covers the commands used by Django's memcached backends, so the cache
+configuration can be tested without a running memcached.
+'''
+import socketserver
+import threading
+import time
+
+
+class MemcachedHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command, *args = line.decode().split()
+            noreply = args and args[-1] == 'noreply'
+            if noreply:
+                args = args[:-1]
+            reply = getattr(self, f'do_{command}', self.do_unknown)(*args)
+            if not noreply:
+                self.wfile.write(reply)
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def lookup(self, key):
+        item = self.store.get(key)
+        if item and item[2] and item[2] < time.time():
+            del self.store[key]
+            return None
+        return item
+
+    def do_get(self, *keys):
+        reply = b''
+        with self.server.lock:
+            for key in keys:
+                item = self.lookup(key)
+                if item:
+                    value, flags, _ = item
+                    reply += b'VALUE %s %d %d\r\n%s\r\n' % (
+                        key.encode(), flags, len(value), value)
+        return reply + b'END\r\n'
+
+    do_gets = do_get
+
+    def store_command(self, key, flags, exptime, length, condition):
+        value = self.rfile.read(int(length) + 2)[:-2]
+        exptime = int(exptime)
+        with self.server.lock:
+            if not condition(self.lookup(key)):
+                return b'NOT_STORED\r\n'
+            self.store[key] = (value, int(flags), self.expires(exptime))
+        return b'STORED\r\n'
+
+    @staticmethod
+    def expires(exptime):
+        if exptime < 0:
+            return time.time() - 1
+        return time.time() + exptime if exptime else 0
+
+    def do_set(self, *args):
+        return self.store_command(*args, lambda item: True)
+
+    def do_add(self, *args):
+        return self.store_command(*args, lambda item: item is None)
+
+    def do_replace(self, *args):
+        return self.store_command(*args, lambda item: item is not None)
+
+    def do_delete(self, key, *args):
+        with self.server.lock:
+            if self.lookup(key) is None:
+                return b'NOT_FOUND\r\n'
+            del self.store[key]
+        return b'DELETED\r\n'
+
+    def change(self, key, delta):
+        with self.server.lock:
+            item = self.lookup(key)
+            if item is None:
+                return b'NOT_FOUND\r\n'
+            value = max(int(item[0]) + delta, 0)
+            self.store[key] = (str(value).encode(), item[1], item[2])
+        return b'%d\r\n' % value
+
+    def do_incr(self, key, delta):
+        return self.change(key, int(delta))
+
+    def do_decr(self, key, delta):
+        return self.change(key, -int(delta))
+
+    def do_touch(self, key, exptime):
+        with self.server.lock:
+            item = self.lookup(key)
+            if item is None:
+                return b'NOT_FOUND\r\n'
+            self.store[key] = item[:2] + (self.expires(int(exptime)),)
+        return b'TOUCHED\r\n'
+
+    def do_flush_all(self, *args):
+        with self.server.lock:
+            self.store.clear()
+        return b'OK\r\n'
+
+    def do_version(self):
+        return b'VERSION stub\r\n'
+
+    def do_unknown(self, *args):
+        return b'ERROR\r\n'
+
+
+class MemcachedServer(socketserver.ThreadingTCPServer):
+    '''Serves on a free localhost port in a background thread.'''
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), MemcachedHandler)
+        self.store = {}
+        self.lock = threading.Lock()
+
+    @property
+    def location(self):
+        return '%s:%d' % self.server_address
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
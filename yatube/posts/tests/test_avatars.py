@@ -0,0 +1,94 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts import avatars
+from posts.avatars import avatar_key, resolve_avatars
+from posts.models import Post, User
+from posts.services import create_comment
+from posts.tests.base import PostsTestCase
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class AvatarResolutionTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Host', email='host@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Thread', author=cls.author)
+        cls.commenters = []
+        for num in range(5):
+            name = default_storage.save(f'avatars/face{num}.png',
+                                        ContentFile(f'face {num}'.encode()))
+            cls.commenters.append(User.objects.create(
+                username=f'Commenter{num}', email=f'face{num}@gmail.com',
+                is_active=True, avatar=name))
+
+    def ready(self, user):
+        url = f'/media/cache/{user.username}.jpg'
+        caches['avatars'].set(avatar_key(user.avatar.name), url)
+        return url
+
+    def test_thumbnails_are_looked_up_once(self):
+        users = AvatarResolutionTest.commenters
+        with mock.patch.object(avatars, 'thumbnail_urls',
+                               return_value={}) as lookup:
+            resolve_avatars(users * 3)
+        lookup.assert_called_once_with(
+            {user.avatar.name for user in users})
+        for user in users:
+            self.ready(user)
+        with mock.patch.object(avatars, 'thumbnail_urls') as lookup:
+            resolved = resolve_avatars(users)
+        lookup.assert_not_called()
+        self.assertEqual(resolved[users[0].pk].thumbnail,
+                         '/media/cache/Commenter0.jpg')
+
+    def test_uploaded_avatars_show_a_variant(self):
+        '''Avatars with variants need no thumbnail lookup at all.'''
+        user = User.objects.create(
+            username='Modern', email='modern@gmail.com', is_active=True,
+            avatar='avatars/modern.jpg', avatar_variants={
+                'width': 512, 'height': 512, 'sources': [
+                    {'type': 'image/webp', 'srcset': [
+                        ['avatars/variants/modern-80.webp', 80],
+                        ['avatars/variants/modern-160.webp', 160]]}]})
+        with mock.patch.object(avatars, 'thumbnail_urls') as lookup:
+            avatar = resolve_avatars([user])[user.pk]
+        lookup.assert_not_called()
+        self.assertEqual(avatar.thumbnail,
+                         '/media/avatars/variants/modern-80.webp')
+
+    def test_default_avatar(self):
+        avatar = resolve_avatars([AvatarResolutionTest.author])[
+            AvatarResolutionTest.author.pk]
+        self.assertEqual(avatar.url, '/media/avatars/default-1.png')
+        self.assertEqual(avatar.thumbnail, avatar.url)
+
+    def test_comment_list(self):
+        ready, pending = AvatarResolutionTest.commenters[:2]
+        url = self.ready(ready)
+        for user in (ready, pending, AvatarResolutionTest.author):
+            create_comment(AvatarResolutionTest.post, user, 'Hello')
+        response = Client().get(reverse('post', kwargs={
+            'username': AvatarResolutionTest.author.username,
+            'post_id': AvatarResolutionTest.post.pk}))
+        self.assertContains(response, f'src="{url}"', count=1)
+        self.assertContains(response, 'thumbnail-placeholder', count=1)
+
+    def test_admin_list(self):
+        admin = User.objects.create_superuser(
+            username='Root', email='root@gmail.com', password='secret-pass')
+        url = self.ready(AvatarResolutionTest.commenters[0])
+        client = Client()
+        client.force_login(admin)
+        with mock.patch.object(avatars, 'thumbnail_urls',
+                               return_value={}) as lookup:
+            response = client.get(reverse('admin:posts_user_changelist'))
+        lookup.assert_called_once()
+        self.assertContains(response, f'src="{url}"')
+        self.assertContains(response, '/media/avatars/default-1.png')
@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import override_settings
+from posts.benchmark import busiest, compare, run, run_templates
+from posts.counters import view_counter, view_key
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+from posts.seeding import Seeder
+from posts.tests.base import PostsTestCase
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class SeederTest(PostsTestCase):
+    def test_seeds_consistent_data(self):
+        created = Seeder(users=20, groups=3, posts=60, comments=200,
+                         avatars=2, max_depth=4, seed=1).run()
+        self.assertEqual(created['posts'], Post.objects.count())
+        self.assertEqual(created['comments'], Comment.objects.count())
+        self.assertFalse(User.objects.filter(avatar='').exists())
+        self.assertEqual(created['follows'], Follow.objects.count())
+        self.assertTrue(TimelineEntry.objects.exists())
+        for comment in Comment.objects.all():
+            self.assertEqual(comment.path[-1], comment.pk)
+            self.assertLessEqual(len(comment.path), 4)
+        post = Post.objects.order_by('-comment_count').first()
+        self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_popularity_is_skewed(self):
+        '''The most followed author has far more followers than the median.'''
+        Seeder(users=50, posts=0, comments=0, avatars=0, seed=2).run()
+        followers = sorted(
+            (user.following.count() for user in User.objects.all()),
+            reverse=True)
+        self.assertGreater(followers[0], 3 * followers[len(followers) // 2])
+
+
+@override_settings(THUMBNAIL_WORKERS=0, QUERY_BUDGET_STRICT=False)
+class BenchmarkTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        Seeder(users=15, groups=2, posts=40, comments=120, avatars=1,
+               seed=3).run()
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(self.baseline))
+
+    def test_every_scenario_is_measured(self):
+        posts = Post.objects.count()
+        results = run(repeat=2, warmup=1)
+        self.assertIn('comment_replies', results)
+        # anonymous feeds are served from the page cache
+        self.assertEqual(results['index']['queries'], 0)
+        self.assertGreater(results['index_reader']['queries'], 0)
+        for name, result in results.items():
+            with self.subTest(scenario=name):
+                self.assertGreater(result['p50'], 0)
+                self.assertLessEqual(result['p50'], result['p95'])
+                self.assertGreater(result['memory'], 0)
+        self.assertEqual(Post.objects.count(), posts)
+
+    def test_run_leaves_caches_and_counters_alone(self):
+        post = busiest()[2]
+        caches['feeds'].set('marker', 'kept')
+        view_counter.flush()
+        run(repeat=1, warmup=0, names=['post', 'index'])
+        self.assertEqual(caches['feeds'].get('marker'), 'kept')
+        self.assertIsNone(caches['counters'].get(view_key(post.pk)))
+        self.assertEqual(view_counter.flush(), 0)
+
+    def test_compare(self):
+        baseline = {'index': {'queries': 3, 'p95': 10.0, 'memory': 100.0}}
+        self.assertEqual(compare(
+            {'index': {'queries': 3, 'p95': 11.0, 'memory': 100.0}},
+            baseline), [])
+        self.assertEqual(len(compare(
+            {'index': {'queries': 4, 'p95': 13.0, 'memory': 100.0}},
+            baseline)), 2)
+
+    def test_command_saves_and_checks_baseline(self):
+        call_command('benchmark', 'index', 'post', repeat=2, warmup=1,
+                     baseline=self.baseline, save=True, stdout=io.StringIO())
+        with open(self.baseline) as baseline:
+            self.assertEqual(set(json.load(baseline)), {'index', 'post'})
+        out = io.StringIO()
+        call_command('benchmark', 'index', repeat=2, warmup=1,
+                     baseline=self.baseline, tolerance=100, stdout=out)
+        self.assertIn('No regressions', out.getvalue())
+        with open(self.baseline, 'w') as baseline:
+            json.dump({'index': {'queries': 0, 'p95': 0, 'memory': 0}},
+                      baseline)
+        with self.assertRaisesMessage(CommandError, 'index: '):
+            call_command('benchmark', 'index', repeat=2, warmup=1,
+                         baseline=self.baseline, stdout=io.StringIO())
+
+    def test_feed_templates_render_in_both_modes(self):
+        results = run_templates(repeat=2, warmup=1)
+        self.assertEqual(set(results), {
+            'index.html', 'group.html', 'profile.html', 'follow.html'})
+        for name, result in results.items():
+            with self.subTest(template=name):
+                self.assertGreater(result['uncached']['p50'], 0)
+                self.assertGreater(result['cached']['p50'], 0)
+        out = io.StringIO()
+        call_command('render_benchmark', repeat=2, warmup=1, stdout=out)
+        self.assertIn('index.html', out.getvalue())
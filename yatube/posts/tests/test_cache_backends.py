@@ -0,0 +1,75 @@
+import tempfile
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from posts.counters import view_counter, view_key
+from posts.tests.memcached_stub import MemcachedServer
+
+
+def shared_caches(backend, location, version=1):
+    return {
+        namespace: {
+            'BACKEND': settings.CACHE_BACKENDS[backend],
+            'LOCATION': location,
+            'KEY_PREFIX': f'test:{namespace}',
+            'VERSION': version,
+        }
+        for namespace in settings.CACHE_NAMESPACES
+    }
+
+
+class MemcachedBackendTest(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.server = MemcachedServer().start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        self.server.store.clear()
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    def test_workers_share_counters(self):
+        '''View hits from two connections add up on the same server.'''
+        with view_counter.discarding():
+            with override_settings(
+                    CACHES=shared_caches('memcached', self.server.location)):
+                view_counter.hit(1)
+            with override_settings(
+                    CACHES=shared_caches('memcached', self.server.location)):
+                self.assertEqual(view_counter.hit(1), 2)
+                self.assertEqual(caches['counters'].get(view_key(1)), 2)
+
+    def test_namespaces_do_not_collide(self):
+        '''The same key stored by two subsystems keeps both values.'''
+        with override_settings(
+                CACHES=shared_caches('memcached', self.server.location)):
+            caches['stats'].set('key', 'stats')
+            caches['feeds'].set('key', 'feeds')
+            self.assertEqual(caches['stats'].get('key'), 'stats')
+            self.assertEqual(caches['feeds'].get('key'), 'feeds')
+        self.assertEqual(len(self.server.store), 2)
+
+    def test_version_bump_hides_old_keys(self):
+        with override_settings(
+                CACHES=shared_caches('memcached', self.server.location)):
+            caches['stats'].set('key', 'old')
+        with override_settings(CACHES=shared_caches(
+                'memcached', self.server.location, version=2)):
+            self.assertIsNone(caches['stats'].get('key'))
+
+
+class FileBackendTest(SimpleTestCase):
+    def test_file_cache_is_shared(self):
+        '''Two handlers over one directory see each other's writes.'''
+        with tempfile.TemporaryDirectory() as location:
+            with override_settings(CACHES=shared_caches('file', location)):
+                caches['feeds'].set('key', 'value')
+            with override_settings(CACHES=shared_caches('file', location)):
+                self.assertEqual(caches['feeds'].get('key'), 'value')
+                self.assertIsNone(caches['stats'].get('key'))
@@ -0,0 +1,53 @@
+from django.test import Client
+from django.urls import reverse
+from posts.models import Post, User
+from posts.tests.base import PostsTestCase
+
+
+class FeedCacheTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Cached', email='cached@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Cached post', author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedCacheTest.author)
+
+    def test_anonymous_index_hit_skips_database(self):
+        '''A cached index page is served without any query.'''
+        self.guest_client.get(reverse('index'))
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(reverse('index'))
+        self.assertContains(response, 'Cached post')
+
+    def test_changes_invalidate_cached_feed(self):
+        '''New posts, edits and comments show up on the cached feed.'''
+        self.guest_client.get(reverse('index'))
+        self.authorized_client.post(
+            reverse('new_post'), data={'text': 'Fresh post'})
+        self.assertContains(
+            self.guest_client.get(reverse('index')), 'Fresh post')
+        self.authorized_client.post(
+            reverse('edit', kwargs={
+                'username': FeedCacheTest.author.username,
+                'post_id': FeedCacheTest.post.id}),
+            data={'text': 'Edited post'})
+        self.assertContains(
+            self.guest_client.get(reverse('index')), 'Edited post')
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={
+                'username': FeedCacheTest.author.username,
+                'post_id': FeedCacheTest.post.id}),
+            data={'text': 'First!'})
+        self.assertContains(
+            self.guest_client.get(reverse('index')), 'Comments: 1')
+
+    def test_authorized_feed_is_not_shared(self):
+        self.guest_client.get(reverse('index'))
+        response = self.authorized_client.get(reverse('index'))
+        self.assertContains(response, 'Favorite authors')
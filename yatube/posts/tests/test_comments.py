@@ -0,0 +1,94 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Post, User
+from posts.services import (bulk_create_comments, create_comment,
+                            recount_comments)
+
+
+class CommentCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Talker', email='talker@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Discuss', author=cls.author)
+
+    def setUp(self) -> None:
+        self.authorized_client = Client()
+        self.authorized_client.force_login(CommentCountTest.author)
+        self.kwargs = {'username': CommentCountTest.author.username,
+                       'post_id': CommentCountTest.post.id}
+
+    def comment(self, text, parent=None):
+        self.authorized_client.post(
+            reverse('add_comment', kwargs=self.kwargs),
+            data={'text': text, 'parent_comment': parent or ''})
+        return Comment.objects.get(text=text)
+
+    def assertStatements(self, number, queries):
+        statements = [query for query in queries.captured_queries
+                      if 'SAVEPOINT' not in query['sql']]
+        self.assertEqual(len(statements), number)
+
+    def comment_count(self):
+        return Post.objects.get(pk=CommentCountTest.post.pk).comment_count
+
+    def test_add_and_delete_keep_count(self):
+        '''Adding and deleting comments keeps Post.comment_count in sync.'''
+        root = self.comment('Root')
+        self.comment('Reply', parent=root.id)
+        self.comment('Other')
+        self.assertEqual(self.comment_count(), 3)
+        url = reverse(
+            'delete_comment', kwargs={**self.kwargs, 'comment_id': root.id})
+        self.assertEqual(self.authorized_client.get(url).status_code, 405)
+        self.assertEqual(self.comment_count(), 3)
+        self.authorized_client.post(url)
+        self.assertEqual(self.comment_count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_create_comment_sets_path_in_one_insert(self):
+        '''The path is complete as soon as the row exists.'''
+        with CaptureQueriesContext(connection) as queries:
+            root = create_comment(
+                CommentCountTest.post, CommentCountTest.author, 'Root')
+        self.assertStatements(2, queries)
+        reply = create_comment(CommentCountTest.post, CommentCountTest.author,
+                               'Reply', parent_id=root.id)
+        self.assertEqual(Comment.objects.get(pk=root.pk).path, [root.id])
+        self.assertEqual(Comment.objects.get(pk=reply.pk).path,
+                         [root.id, reply.id])
+        other = Post.objects.create(
+            text='Other', author=CommentCountTest.author)
+        with self.assertRaises(Comment.DoesNotExist):
+            create_comment(other, CommentCountTest.author, 'Lost',
+                           parent_id=root.id)
+
+    def test_bulk_create_comments(self):
+        '''An imported thread gets its paths and counts in three queries.'''
+        root = Comment(author=CommentCountTest.author, text='Imported')
+        reply = Comment(author=CommentCountTest.author, text='Answer')
+        reply.parent = root
+        with CaptureQueriesContext(connection) as queries:
+            bulk_create_comments(CommentCountTest.post, [root, reply])
+        self.assertStatements(3, queries)
+        self.assertEqual(Comment.objects.get(text='Answer').path,
+                         [root.id, reply.id])
+        self.assertEqual(self.comment_count(), 2)
+
+    def test_recount_repairs_drift(self):
+        '''recount_comments restores the counts from the comments table.'''
+        self.comment('Counted')
+        Post.objects.update(comment_count=42)
+        recount_comments()
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_feed_does_not_load_comments(self):
+        '''The index page is two queries however many comments there are.'''
+        for num in range(3):
+            self.comment(f'Comment {num}')
+        with self.assertNumQueries(2):
+            response = Client().get(reverse('index'))
+        self.assertContains(response, 'Comments: 3')
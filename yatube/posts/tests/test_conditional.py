@@ -0,0 +1,117 @@
+import time
+
+from django.core.cache import caches
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.http import parse_http_date
+from posts.caching import FEED_VERSION_KEY
+from posts.counters import view_key
+from posts.deletion import delete_posts
+from posts.models import Follow, Post, User
+from posts.services import create_comment
+from posts.tests.base import PostsTestCase
+
+
+class ConditionalGetTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Etag', email='etag@gmail.com', is_active=True)
+        cls.reader = User.objects.create(
+            username='Reader', email='etag.reader@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Cached', author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.guest = Client()
+        self.post_url = reverse('post', kwargs={
+            'username': ConditionalGetTest.author.username,
+            'post_id': ConditionalGetTest.post.id})
+
+    def assertNotModified(self, url, response, client=None):
+        response = (client or self.guest).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def assertModified(self, url, response, client=None):
+        response = (client or self.guest).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_pages_are_not_modified(self):
+        '''Feeds and post pages answer a matching ETag with 304.'''
+        for url in (reverse('index'), reverse('profile', kwargs={
+                'username': ConditionalGetTest.author.username}),
+                self.post_url):
+            with self.subTest(url=url):
+                self.assertNotModified(url, self.guest.get(url))
+
+    def test_new_post_changes_etag(self):
+        response = self.guest.get(reverse('index'))
+        Post.objects.create(text='Fresh', author=ConditionalGetTest.author)
+        self.assertModified(reverse('index'), response)
+
+    def test_comment_changes_etag(self):
+        response = self.guest.get(self.post_url)
+        create_comment(ConditionalGetTest.post, ConditionalGetTest.reader,
+                       'First', None)
+        self.assertModified(self.post_url, response)
+
+    def test_follow_changes_etag(self):
+        client = Client()
+        client.force_login(ConditionalGetTest.reader)
+        url = reverse('follow_index')
+        response = client.get(url)
+        self.assertNotModified(url, response, client)
+        Follow.objects.create(user=ConditionalGetTest.reader,
+                              author=ConditionalGetTest.author)
+        self.assertModified(url, response, client)
+
+    def test_etag_depends_on_viewer(self):
+        client = Client()
+        client.force_login(ConditionalGetTest.reader)
+        self.assertNotEqual(client.get(reverse('index'))['ETag'],
+                            self.guest.get(reverse('index'))['ETag'])
+
+    def age_feed_version(self, seconds):
+        caches['feeds'].set(FEED_VERSION_KEY,
+                            time.time_ns() - seconds * 10 ** 9, None)
+
+    def test_deleting_moves_last_modified(self):
+        '''A delete never leaves If-Modified-Since answered with 304.'''
+        post = Post.objects.create(text='Newest',
+                                   author=ConditionalGetTest.author)
+        self.age_feed_version(10)
+        modified = self.guest.get(reverse('index'))['Last-Modified']
+        response = self.guest.get(reverse('index'),
+                                  HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+        delete_posts(Post.objects.filter(pk=post.pk))
+        # a version younger than a second has no Last-Modified
+        response = self.guest.get(reverse('index'),
+                                  HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.age_feed_version(5)
+        response = self.guest.get(reverse('index'),
+                                  HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(parse_http_date(response['Last-Modified']),
+                           parse_http_date(modified))
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    def test_not_modified_post_counts_the_view(self):
+        post = ConditionalGetTest.post
+        response = self.guest.get(self.post_url)
+        self.assertNotModified(self.post_url, response)
+        self.assertEqual(caches['counters'].get(view_key(post.pk)), 2)
+
+    @override_settings(CONDITIONAL_FEEDS=False)
+    def test_without_shared_cache_pages_are_always_sent(self):
+        '''A worker's own cache cannot tell it about changes elsewhere.'''
+        response = self.guest.get(reverse('index'))
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.guest.get(reverse('index'), HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 200)
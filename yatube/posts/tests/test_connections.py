@@ -0,0 +1,24 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from posts.signals import check_connections, mark_connections_idle
+
+
+@override_settings(DATABASE_HEALTH_CHECKS=True, DATABASE_HEALTH_CHECK_IDLE=30)
+class HealthCheckTest(TestCase):
+    def check(self):
+        # the test case runs in a transaction, which is never checked
+        with mock.patch.object(connection, 'in_atomic_block', False):
+            with mock.patch.object(connection, 'is_usable',
+                                   return_value=True) as is_usable:
+                check_connections()
+        return is_usable.called
+
+    def test_busy_connections_are_not_pinged(self):
+        '''Only a connection idle for a while gets a round trip.'''
+        connection.ensure_connection()
+        mark_connections_idle()
+        self.assertFalse(self.check())
+        connection.idle_since -= 60
+        self.assertTrue(self.check())
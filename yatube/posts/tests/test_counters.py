@@ -0,0 +1,96 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts import counters
+from posts.counters import view_counter, view_key
+from posts.models import Post, User
+from posts.tests.base import PostsTestCase
+
+
+@override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600)
+class ViewCounterTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Counter', email='counter@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Count me', author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.guest_client = Client()
+        self.url = reverse('post', kwargs={
+            'username': ViewCounterTest.author.username,
+            'post_id': ViewCounterTest.post.id})
+
+    def counter(self):
+        return Post.objects.get(pk=ViewCounterTest.post.pk).counter
+
+    def test_view_does_not_write_post(self):
+        '''Opening a post page does not save the post row.'''
+        for _ in range(3):
+            response = self.guest_client.get(self.url)
+        self.assertEqual(response.context['post'].counter, 3)
+        self.assertEqual(self.counter(), 0)
+
+    def test_flush_adds_buffered_views(self):
+        '''Flushing moves buffered views to Post.counter exactly once.'''
+        for _ in range(5):
+            view_counter.hit(ViewCounterTest.post.pk)
+        view_counter.flush()
+        view_counter.flush()
+        self.assertEqual(self.counter(), 5)
+        self.assertEqual(
+            caches['counters'].get(view_key(ViewCounterTest.post.pk)), 0)
+
+    def test_evicted_views_are_still_written(self):
+        '''Losing the cached count does not lose the views.'''
+        for _ in range(3):
+            view_counter.hit(ViewCounterTest.post.pk)
+        caches['counters'].clear()
+        view_counter.flush()
+        self.assertEqual(self.counter(), 3)
+
+    def test_failed_flush_keeps_the_views(self):
+        view_counter.hit(ViewCounterTest.post.pk)
+        with mock.patch.object(counters, 'write_views',
+                               side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                view_counter.flush()
+        view_counter.flush()
+        self.assertEqual(self.counter(), 1)
+
+    def test_command_has_workers_flush(self):
+        '''flush_view_counts does not wait for the interval to pass.'''
+        view_counter.hit(ViewCounterTest.post.pk)
+
+        def sleep(seconds):
+            if sleep.calls:
+                raise StopIteration
+            sleep.calls += 1
+            call_command('flush_view_counts', stdout=mock.Mock())
+        sleep.calls = 0
+
+        with mock.patch.object(counters.time, 'sleep', sleep), \
+                mock.patch.object(counters, 'connections'):
+            with self.assertRaises(StopIteration):
+                view_counter.run()
+        self.assertEqual(self.counter(), 1)
+
+    def test_flush_at_exit_does_not_raise(self):
+        view_counter.hit(ViewCounterTest.post.pk)
+        with mock.patch.object(counters, 'write_views',
+                               side_effect=DatabaseError), \
+                self.assertLogs('posts.counters', 'ERROR'):
+            view_counter.flush_at_exit()
+        view_counter.flush_at_exit()
+        self.assertEqual(self.counter(), 1)
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=0)
+    def test_views_are_written_at_once_without_interval(self):
+        self.assertEqual(view_counter.hit(ViewCounterTest.post.pk), 0)
+        self.assertEqual(self.counter(), 1)
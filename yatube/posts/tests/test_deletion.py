@@ -0,0 +1,155 @@
+import io
+import os
+
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.deletion import (delete_posts, delete_user, delete_user_later,
+                            deletion_progress)
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+from posts.services import create_comment
+from posts.tests.base import PostsTestCase
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x01\x00\x01\x00\x00\x00\x00\x21'
+             b'\xf9\x04\x01\x0a\x00\x01\x00\x2c\x00\x00\x00\x00\x01\x00'
+             b'\x01\x00\x00\x02\x02\x4c\x01\x00\x3b')
+
+
+@override_settings(DELETION_WORKERS=0,
+                   DELETION_BATCH_SIZE=3, THUMBNAIL_WORKERS=0)
+class DeletionTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Keeper', email='keeper@gmail.com', is_active=True)
+        cls.spammer = User.objects.create(
+            username='Spammer', email='spammer@gmail.com', is_active=True)
+
+    def create_posts(self, author, number, comments=0):
+        posts = [Post.objects.create(text=f'Post {num}', author=author)
+                 for num in range(number)]
+        for post in posts:
+            for num in range(comments):
+                create_comment(post, DeletionTest.author, f'Comment {num}')
+        return posts
+
+    def test_queries_do_not_grow_with_comments(self):
+        '''Comments are deleted by a statement, not loaded one by one.'''
+        counts = []
+        for comments in (1, 20):
+            self.create_posts(DeletionTest.spammer, 2, comments)
+            with CaptureQueriesContext(connection) as queries:
+                delete_posts(Post.objects.filter(author=DeletionTest.spammer))
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_delete_posts_in_batches(self):
+        Follow.objects.create(user=DeletionTest.author,
+                              author=DeletionTest.spammer)
+        self.create_posts(DeletionTest.spammer, 7, 2)
+        keep = self.create_posts(DeletionTest.author, 1, 1)[0]
+        self.assertTrue(TimelineEntry.objects.exists())
+        done = []
+        deleted = delete_posts(Post.objects.filter(
+            author=DeletionTest.spammer), progress=done.append)
+        self.assertEqual(deleted, 7)
+        self.assertEqual(done, [3, 6, 7])
+        self.assertEqual(list(Post.objects.all()), [keep])
+        self.assertEqual(Comment.objects.get().post, keep)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_view_removes_the_image(self):
+        post = Post.objects.create(
+            text='Pictured', author=DeletionTest.author,
+            image=SimpleUploadedFile('deleted.gif', SMALL_GIF,
+                                     content_type='image/gif'))
+        path = post.image.path
+        self.assertTrue(os.path.exists(path))
+        client = Client()
+        client.force_login(DeletionTest.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.get(reverse('delete', kwargs={
+                'username': DeletionTest.author.username,
+                'post_id': post.id}))
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_delete_user(self):
+        '''Replies to the user's comments go too and counts are fixed.'''
+        post = self.create_posts(DeletionTest.author, 1)[0]
+        spam = create_comment(post, DeletionTest.spammer, 'Spam')
+        create_comment(post, DeletionTest.author, 'Reply', spam.id)
+        create_comment(post, DeletionTest.author, 'Kept')
+        self.create_posts(DeletionTest.spammer, 4, 2)
+        Follow.objects.create(user=DeletionTest.author,
+                              author=DeletionTest.spammer)
+        Follow.objects.create(user=DeletionTest.spammer,
+                              author=DeletionTest.author)
+        reports = []
+        state = delete_user(DeletionTest.spammer.pk, report=reports.append)
+        self.assertTrue(state['done'])
+        self.assertEqual(state['deleted'], {
+            'comments': 2, 'posts': 4, 'follows': 2})
+        self.assertGreater(len(reports), 3)
+        self.assertFalse(User.objects.filter(username='Spammer').exists())
+        self.assertEqual(list(Comment.objects.values_list('text', flat=True)),
+                         ['Kept'])
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_admin_deletes_in_background(self):
+        admin = User.objects.create_superuser(
+            username='Root', email='root@gmail.com', password='secret-pass')
+        self.create_posts(DeletionTest.spammer, 2, 1)
+        client = Client()
+        client.force_login(admin)
+        url = reverse('admin:posts_user_delete',
+                      args=[DeletionTest.spammer.pk])
+        response = client.get(url)
+        self.assertContains(response, 'Posts: 2')
+        with self.captureOnCommitCallbacks() as callbacks:
+            client.post(url, {'post': 'yes'})
+        spammer = User.objects.get(pk=DeletionTest.spammer.pk)
+        self.assertFalse(spammer.is_active)
+        self.assertEqual(deletion_progress(spammer.pk)['stage'], 'queued')
+        for callback in callbacks:
+            callback()
+        self.assertFalse(User.objects.filter(pk=spammer.pk).exists())
+        self.assertTrue(deletion_progress(spammer.pk)['done'])
+
+    def test_admin_needs_to_delete_what_goes_with_the_user(self):
+        moderator = User.objects.create(
+            username='Moderator', email='moderator@gmail.com',
+            is_active=True, is_staff=True)
+        moderator.user_permissions.add(
+            Permission.objects.get(codename='delete_user'))
+        client = Client()
+        client.force_login(moderator)
+        url = reverse('admin:posts_user_delete',
+                      args=[DeletionTest.spammer.pk])
+        response = client.get(url)
+        self.assertEqual(response.context['perms_lacking'],
+                         {'post', 'comment', 'follow'})
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, 403)
+        self.assertTrue(User.objects.get(pk=DeletionTest.spammer.pk).is_active)
+
+    def test_delete_user_later_keeps_the_request_short(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            delete_user_later(DeletionTest.spammer)
+        self.assertEqual(len(callbacks), 1)
+        self.assertTrue(User.objects.filter(username='Spammer').exists())
+
+    def test_command(self):
+        self.create_posts(DeletionTest.spammer, 1)
+        out = io.StringIO()
+        call_command('delete_user', 'Spammer', stdout=out)
+        self.assertIn('posts: 1 posts', out.getvalue())
+        self.assertIn('Spammer deleted', out.getvalue())
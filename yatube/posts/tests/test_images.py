@@ -0,0 +1,142 @@
+import io
+import os
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.images import VARIANT_FORMATS, variant_names
+from posts.models import Post, User
+from posts.tests.base import PostsTestCase
+
+
+def image_upload(name='photo.jpg', size=(3000, 2000), mode='RGB',
+                 format='JPEG'):
+    content = io.BytesIO()
+    Image.new(mode, size, 'teal').save(content, format)
+    return SimpleUploadedFile(name, content.getvalue(),
+                              content_type=f'image/{format.lower()}')
+
+
+@override_settings(THUMBNAIL_WORKERS=0, DELETION_WORKERS=0)
+class ImageUploadTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Photographer', email='photo@gmail.com',
+            is_active=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(ImageUploadTest.author)
+
+    def upload(self, image):
+        return self.client.post(reverse('new_post'), data={
+            'text': 'Photo', 'image': image})
+
+    def test_upload_is_capped_and_reencoded(self):
+        self.upload(image_upload())
+        post = Post.objects.get(text='Photo')
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (2048, 1365))
+            self.assertEqual(image.format, 'JPEG')
+        variants = post.image_variants
+        self.assertEqual((variants['width'], variants['height']),
+                         (2048, 1365))
+        self.assertEqual([source['type'] for source in variants['sources']],
+                         [mime for _, mime in VARIANT_FORMATS])
+        for source in variants['sources']:
+            self.assertEqual([width for _, width in source['srcset']],
+                             [480, 960, 1440])
+            for name, width in source['srcset']:
+                with default_storage.open(name) as file, Image.open(
+                        file) as image:
+                    self.assertEqual(image.width, width)
+
+    def test_small_images_are_not_upscaled(self):
+        self.upload(image_upload('small.png', (600, 300), 'RGBA', 'PNG'))
+        variants = Post.objects.get(text='Photo').image_variants
+        for source in variants['sources']:
+            self.assertEqual([width for _, width in source['srcset']],
+                             [480, 600])
+
+    def test_feed_serves_srcset(self):
+        self.upload(image_upload())
+        post = Post.objects.get(text='Photo')
+        response = Client().get(reverse('index'))
+        for name in variant_names(post.image_variants):
+            self.assertContains(response, default_storage.url(name))
+        self.assertContains(response, f'src="{post.image.url}"')
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_too_many_pixels(self):
+        response = self.upload(image_upload(size=(100, 100)))
+        self.assertFormError(response, 'form', 'image',
+                             'The image has more than 0 megapixels.')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024 * 1024)
+    def test_too_many_bytes(self):
+        content = io.BytesIO()
+        # noise does not compress, 700x700 is about 1.4 MB
+        Image.frombytes('RGB', (700, 700), os.urandom(700 * 700 * 3)).save(
+            content, 'PNG')
+        response = self.upload(SimpleUploadedFile(
+            'noise.png', content.getvalue(), content_type='image/png'))
+        self.assertFormError(response, 'form', 'image',
+                             'The image is larger than 1 MB.')
+
+    def test_avatar_variants_are_square(self):
+        response = Client().post(reverse('signup'), data={
+            'username': 'Portrait', 'email': 'portrait@gmail.com',
+            'password1': 'Very-secret-42', 'password2': 'Very-secret-42',
+            'avatar': image_upload('face.jpg', (800, 600))})
+        self.assertEqual(response.status_code, 302)
+        user = User.objects.get(username='Portrait')
+        self.assertEqual((user.avatar.width, user.avatar.height),
+                         (512, 512))
+        for source in user.avatar_variants['sources']:
+            self.assertEqual([width for _, width in source['srcset']],
+                             [80, 160, 320])
+
+    def stored_files(self):
+        return {os.path.join(root, name) for root, _, names
+                in os.walk(settings.MEDIA_ROOT) for name in names}
+
+    def test_failed_post_save_leaves_no_files(self):
+        before = self.stored_files()
+        with mock.patch.object(Post, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                self.upload(image_upload('lost.jpg', (900, 600)))
+        self.assertFalse(self.stored_files() - before)
+
+    def test_failed_signup_leaves_no_files(self):
+        before = self.stored_files()
+        with mock.patch.object(User, 'save', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                Client().post(reverse('signup'), data={
+                    'username': 'Lost', 'email': 'lost@gmail.com',
+                    'password1': 'Very-secret-42',
+                    'password2': 'Very-secret-42',
+                    'avatar': image_upload('lost.jpg', (400, 300))})
+        self.assertFalse(self.stored_files() - before)
+
+    def test_delete_removes_variants(self):
+        self.upload(image_upload())
+        post = Post.objects.get(text='Photo')
+        files = [post.image.path] + [
+            default_storage.path(name)
+            for name in variant_names(post.image_variants)]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('delete', kwargs={
+                'username': ImageUploadTest.author.username,
+                'post_id': post.id}))
+        self.assertFalse(any(os.path.exists(path) for path in files))
@@ -0,0 +1,113 @@
+import json
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.base import PostsTestCase
+
+AUTHORS = 20
+POSTS_PER_AUTHOR = 150
+BUSY_THREAD = 1000
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+class FeedIndexTest(PostsTestCase):
+    '''Feed queries read a seeded table through indexes, without sorting.'''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.authors = User.objects.bulk_create(
+            User(username=f'seed{num}', email=f'seed{num}@gmail.com',
+                 is_active=True) for num in range(AUTHORS))
+        cls.groups = Group.objects.bulk_create(
+            Group(title=f'Seed {num}', slug=f'seed-{num}',
+                  description='Seeded') for num in range(AUTHORS))
+        Post.objects.bulk_create(
+            Post(text=f'Post {num}', author=cls.authors[num % AUTHORS],
+                 group=cls.groups[num * 7 % AUTHORS])
+            for num in range(AUTHORS * POSTS_PER_AUTHOR))
+        cls.post = Post.objects.filter(author=cls.authors[0]).first()
+        Comment.objects.bulk_create(
+            Comment(post=post, author=cls.authors[0], text='Seed', path=[])
+            for post in Post.objects.all() for _ in range(3))
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.authors[1], text='Busy', path=[])
+            for _ in range(BUSY_THREAD))
+        with connection.cursor() as cursor:
+            cursor.execute('UPDATE posts_comment SET path = ARRAY[id]')
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author)
+            for user in cls.authors for author in cls.authors
+            if user != author)
+        with connection.cursor() as cursor:
+            for model in (Post, Comment, Follow):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(FeedIndexTest.authors[0])
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return list(plan_nodes(plan[0]['Plan']))
+
+    def assertFeedUsesIndex(self, url, table, index, presorted=True):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        feed_queries = [
+            query['sql'] for query in queries
+            if query['sql'].startswith('SELECT')
+            and f'FROM "{table}"' in query['sql']
+            and 'ORDER BY' in query['sql']]
+        self.assertTrue(feed_queries, f'{url} did not query {table}')
+        for sql in feed_queries:
+            nodes = self.explain(sql)
+            with self.subTest(url=url, sql=sql):
+                self.assertIn(
+                    index, [node.get('Index Name') for node in nodes])
+                self.assertNotIn(
+                    (table, 'Seq Scan'),
+                    [(node.get('Relation Name'), node['Node Type'])
+                     for node in nodes])
+                if presorted:
+                    self.assertNotIn(
+                        'Sort', [node['Node Type'] for node in nodes])
+
+    def test_index_feed(self):
+        self.assertFeedUsesIndex(
+            reverse('index'), 'posts_post', 'post_pub_date_idx')
+        self.assertFeedUsesIndex(
+            reverse('index') + '?cursor=', 'posts_post',
+            'post_pub_date_idx')
+
+    def test_group_feed(self):
+        self.assertFeedUsesIndex(
+            reverse('group', kwargs={'slug': FeedIndexTest.groups[1].slug}),
+            'posts_post', 'post_group_pub_date_idx')
+
+    def test_profile_feed(self):
+        self.assertFeedUsesIndex(
+            reverse('profile', kwargs={
+                'username': FeedIndexTest.authors[1].username}),
+            'posts_post', 'post_author_pub_date_idx')
+
+    def test_comment_threads(self):
+        '''Only a page of threads is sorted, never all comments of a post.'''
+        self.assertFeedUsesIndex(
+            reverse('post', kwargs={
+                'username': FeedIndexTest.authors[0].username,
+                'post_id': FeedIndexTest.post.id}),
+            'posts_comment', 'comment_root_idx', presorted=False)
@@ -0,0 +1,96 @@
+import io
+import os
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import Client, override_settings
+from django.urls import reverse
+from posts.instrumentation import SERIES_KEY, export, switch
+from posts.models import Group, Post, User
+from posts.tests.base import PostsTestCase
+
+PROFILE_DIR = tempfile.mkdtemp()
+
+
+@override_settings(INSTRUMENTATION_REFRESH=0, METRICS_FLUSH_INTERVAL=0,
+                   PROFILE_DIR=PROFILE_DIR, METRICS_TOKEN='')
+class InstrumentationTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Probe', email='probe@gmail.com', is_active=True)
+        cls.group = Group.objects.create(
+            title='Probes', slug='probes', description='Probes')
+        Post.objects.create(text='Measured', author=cls.author,
+                            group=cls.group)
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.addCleanup(switch.reset)
+        self.client = Client()
+
+    def test_off_by_default(self):
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertIsNone(caches['stats'].get(SERIES_KEY))
+
+    def test_metrics(self):
+        switch.set(metrics=True)
+        response = self.client.get(reverse('index'))
+        spans = [item.split(';')[0]
+                 for item in response['Server-Timing'].split(', ')]
+        self.assertEqual(set(spans), {'db', 'template', 'total'})
+        exported = export()
+        self.assertIn('# TYPE yatube_request_seconds histogram', exported)
+        self.assertIn('yatube_request_seconds_count{method="GET",'
+                      'status="2xx",view="index"} 1', exported)
+        self.assertIn('yatube_span_seconds_bucket{span="template",'
+                      'view="index",le="+Inf"} 1', exported)
+
+    @override_settings(METRICS_FLUSH_INTERVAL=3600)
+    def test_requests_do_not_flush_metrics(self):
+        '''Measured requests leave the cache writes to the timer thread.'''
+        switch.set(metrics=True)
+        self.client.get(reverse('index'))
+        self.assertIsNone(caches['stats'].get(SERIES_KEY))
+        self.assertIn('view="index"', export())
+
+    def test_metrics_view_is_protected(self):
+        switch.set(metrics=True)
+        self.client.get(reverse('index'))
+        # local requests are not trusted, they may come through a proxy
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 404)
+        with self.settings(METRICS_TOKEN='scrape'):
+            response = self.client.get(reverse('metrics'))
+            self.assertEqual(response.status_code, 403)
+            response = self.client.get(reverse('metrics'),
+                                       HTTP_AUTHORIZATION='Bearer scrape')
+            self.assertContains(response, 'view="index"')
+
+    def test_sampled_profiles(self):
+        '''Only the chosen views are profiled.'''
+        call_command('instrument', profile_rate=1, profile_views=['group'],
+                     stdout=io.StringIO())
+        self.client.get(reverse('index'))
+        self.client.get(reverse('group', kwargs={'slug': 'probes'}))
+        profiles = os.listdir(PROFILE_DIR)
+        self.assertEqual(len(profiles), 1)
+        self.assertTrue(profiles[0].startswith('group-'))
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('instrument', metrics='on', stdout=out)
+        self.assertIn('Metrics on, profiling 0.0% of requests to all views',
+                      out.getvalue())
+        self.assertTrue(switch.refresh().metrics)
+        call_command('instrument', reset=True, stdout=io.StringIO())
+        self.assertFalse(switch.refresh().active)
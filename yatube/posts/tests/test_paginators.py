@@ -0,0 +1,55 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from posts.models import Post, User
+from posts.paginators import CursorPage, CursorPaginator
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Cursor', email='cursor@gmail.com', is_active=True)
+        for num in range(25):
+            Post.objects.create(text=f'Post {num}', author=cls.author)
+        cls.expected = list(Post.objects.order_by('-pub_date', '-id'))
+
+    def setUp(self) -> None:
+        self.paginator = CursorPaginator(Post.objects.all(), 10)
+
+    def test_walks_forward_and_back(self):
+        '''Next and previous cursors return the neighbouring pages.'''
+        first = self.paginator.get_page(None)
+        second = self.paginator.get_page(first.next_cursor)
+        third = self.paginator.get_page(second.next_cursor)
+        self.assertEqual(list(first), CursorPaginatorTest.expected[:10])
+        self.assertEqual(list(second), CursorPaginatorTest.expected[10:20])
+        self.assertEqual(list(third), CursorPaginatorTest.expected[20:])
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+        back = self.paginator.get_page(third.previous_cursor)
+        self.assertEqual(list(back), list(second))
+        self.assertTrue(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_page_is_a_single_query(self):
+        '''A deep page costs one query and never counts the posts.'''
+        page = self.paginator.get_page(None)
+        with self.assertNumQueries(1):
+            page = self.paginator.get_page(page.next_cursor)
+            list(page)
+
+    def test_malformed_cursor_returns_first_page(self):
+        page = self.paginator.get_page('not-a-cursor')
+        self.assertEqual(list(page), CursorPaginatorTest.expected[:10])
+
+    def test_feed_opts_into_cursor_mode(self):
+        '''The ?cursor= parameter or the setting switches the feed mode.'''
+        client = Client()
+        response = client.get(reverse('index') + '?cursor=')
+        self.assertIsInstance(response.context['page'], CursorPage)
+        self.assertContains(response, '?cursor=')
+        with override_settings(FEED_CURSOR_PAGINATION=True):
+            response = client.get(reverse('profile', kwargs={
+                'username': CursorPaginatorTest.author.username}))
+        self.assertIsInstance(response.context['page'], CursorPage)
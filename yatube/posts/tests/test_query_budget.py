@@ -0,0 +1,93 @@
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+from django.urls import reverse
+from posts.middleware import (QueryBudgetExceeded, QueryBudgetMiddleware,
+                              query_budget)
+from posts.models import Comment, Follow, Group, Post, User
+from posts.tests.base import PostsTestCase
+
+
+def greedy_view(request):
+    for _ in range(3):
+        User.objects.exists()
+    return HttpResponse()
+
+
+class QueryBudgetTest(PostsTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.factory = RequestFactory()
+
+    def serve(self, view):
+        middleware = QueryBudgetMiddleware(view)
+        request = self.factory.get('/')
+        middleware.process_view(request, view, (), {})
+        return middleware(request)
+
+    @override_settings(QUERY_BUDGET=2, QUERY_BUDGET_STRICT=False)
+    def test_over_budget_is_logged(self):
+        with self.assertLogs('posts.queries', 'WARNING') as logs:
+            self.serve(greedy_view)
+        self.assertIn('ran 3 queries', logs.output[0])
+
+    @override_settings(QUERY_BUDGET=2, QUERY_BUDGET_STRICT=True)
+    def test_over_budget_fails_when_strict(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.serve(greedy_view)
+
+    @override_settings(QUERY_BUDGET=2, QUERY_BUDGET_STRICT=True)
+    def test_view_budget(self):
+        self.assertEqual(self.serve(query_budget(3)(greedy_view)).status_code,
+                         200)
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class FeedQueryCountTest(PostsTestCase):
+    '''Feeds run a fixed number of queries however many posts they show.'''
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Counted', email='counted@gmail.com', is_active=True)
+        cls.reader = User.objects.create(
+            username='Counter', email='counter@gmail.com', is_active=True)
+        cls.group = Group.objects.create(
+            title='Counted', slug='counted', description='Counted')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for num in range(12):
+            cls.post = Post.objects.create(
+                text=f'Post {num}', author=cls.author, group=cls.group)
+        for num in range(3):
+            Comment.objects.create(post=cls.post, author=cls.reader,
+                                   text=f'Comment {num}', path=[])
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(FeedQueryCountTest.reader)
+
+    def assertFeedQueries(self, number, url):
+        self.client.get(url)
+        with self.assertNumQueries(number):
+            self.client.get(url)
+
+    def test_index(self):
+        self.assertFeedQueries(4, reverse('index'))
+
+    def test_group(self):
+        self.assertFeedQueries(5, reverse('group', kwargs={
+            'slug': FeedQueryCountTest.group.slug}))
+
+    def test_profile(self):
+        self.assertFeedQueries(6, reverse('profile', kwargs={
+            'username': FeedQueryCountTest.author.username}))
+
+    def test_follow(self):
+        self.assertFeedQueries(4, reverse('follow_index'))
+
+    @override_settings(VIEW_COUNTER_FLUSH_INTERVAL=3600)
+    def test_post(self):
+        self.assertFeedQueries(5, reverse('post', kwargs={
+            'username': FeedQueryCountTest.author.username,
+            'post_id': FeedQueryCountTest.post.id}))
@@ -0,0 +1,62 @@
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from posts.middleware import STICKY_COOKIE, ReplicaStickinessMiddleware
+from posts.models import Post
+from posts.routers import ReplicaRouter, replica_reads
+
+router = ReplicaRouter()
+
+
+def routed_view(request):
+    '''Records where a read and a write of the view would go.'''
+    response = HttpResponse()
+    response.read_db = router.db_for_read(Post)
+    response.write_db = router.db_for_write(Post)
+    return response
+
+
+@override_settings(REPLICA_DATABASES=['replica0'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self) -> None:
+        self.factory = RequestFactory()
+
+    def serve(self, request, view=routed_view):
+        return ReplicaStickinessMiddleware(view)(request)
+
+    def test_read_only_views_use_replica(self):
+        response = self.serve(
+            self.factory.get('/'), replica_reads(routed_view))
+        self.assertEqual(response.read_db, 'replica0')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_other_views_use_primary(self):
+        response = self.serve(self.factory.get('/'))
+        self.assertEqual(response.read_db, 'default')
+
+    def test_write_pins_client_to_primary(self):
+        '''After a write the client reads its own writes for a while.'''
+        response = self.serve(self.factory.post('/'))
+        self.assertEqual(response.write_db, 'default')
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 5)
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        response = self.serve(request, replica_reads(routed_view))
+        self.assertEqual(response.read_db, 'default')
+
+    def test_writes_of_read_only_views_do_not_pin(self):
+        '''Bookkeeping writes of a read-only view, like a view count or a
+        thumbnail, are not sticky; other views writing on GET are.'''
+        response = self.serve(
+            self.factory.get('/'), replica_reads(routed_view))
+        self.assertEqual(response.write_db, 'default')
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        response = self.serve(self.factory.get('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    @override_settings(REPLICA_DATABASES=[])
+    def test_without_replicas(self):
+        response = self.serve(
+            self.factory.get('/'), replica_reads(routed_view))
+        self.assertEqual(response.read_db, 'default')
+        response = self.serve(self.factory.post('/'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
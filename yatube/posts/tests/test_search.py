@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.test import Client
+from django.urls import reverse
+from posts.models import Post
+from posts.search import search_posts
+from posts.tests.base import PostsTestCase
+
+User = get_user_model()
+
+
+class SearchTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Seeker', email='seeker@gmail.com', is_active=True)
+        cls.cats = Post.objects.create(
+            text='Кошки любят рыбу. Кошки спят.', author=cls.author)
+        cls.cat = Post.objects.create(
+            text='Моя кошка <b>спит</b>', author=cls.author)
+        Post.objects.create(text='Собаки любят гулять', author=cls.author)
+
+    def test_ranked_matches(self):
+        '''Word forms match and the denser match comes first.'''
+        self.assertEqual(list(search_posts('кошка')),
+                         [SearchTest.cats, SearchTest.cat])
+        self.assertEqual(list(search_posts('кошка -рыба')), [SearchTest.cat])
+
+    def test_vector_follows_edits(self):
+        post = Post.objects.create(text='Черновик', author=SearchTest.author)
+        post.text = 'Попугай'
+        post.save()
+        self.assertEqual(list(search_posts('попугай')), [post])
+        self.assertFalse(search_posts('черновик').exists())
+
+    def test_search_page_highlights_matches(self):
+        response = Client().get(reverse('search'), {'q': 'спит'})
+        self.assertEqual(list(response.context['page']), [SearchTest.cat])
+        self.assertContains(
+            response, 'Моя кошка &lt;b&gt;<mark>спит</mark>&lt;/b&gt;')
+        self.assertNotContains(response, '<b>спит')
+
+    def test_empty_query(self):
+        response = Client().get(reverse('search'))
+        self.assertIsNone(response.context['page'])
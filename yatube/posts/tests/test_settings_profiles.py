@@ -0,0 +1,47 @@
+import io
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import Engine
+from django.template.loaders import cached
+from django.test import SimpleTestCase
+from django.urls import NoReverseMatch, reverse
+from posts.management.commands.startup_cost import parse_importtime, probe
+
+
+class SettingsProfileTest(SimpleTestCase):
+    def test_tests_run_with_the_test_profile(self):
+        self.assertEqual(settings.SETTINGS_PROFILE, 'test')
+        self.assertNotIn('debug_toolbar', settings.INSTALLED_APPS)
+        self.assertFalse(any('debug_toolbar' in middleware
+                             for middleware in settings.MIDDLEWARE))
+        with self.assertRaises(NoReverseMatch):
+            reverse('djdt:render_panel')
+
+    def test_templates_are_cached_outside_dev(self):
+        self.assertTrue(settings.TEMPLATE_CACHE)
+        self.assertIsInstance(Engine.get_default().template_loaders[0],
+                              cached.Loader)
+
+    def test_probe_loads_dev_apps_only_in_dev(self):
+        prod, dev = probe('prod'), probe('dev')
+
+        def toolbar_imported(run):
+            return any(module.startswith('debug_toolbar')
+                       for module in run['imports'])
+        self.assertFalse(toolbar_imported(prod))
+        self.assertTrue(toolbar_imported(dev))
+        self.assertGreater(dev['modules'], prod['modules'])
+
+    def test_parse_importtime(self):
+        log = ('import time: self [us] | cumulative | imported package\n'
+               'import time:       120 |        120 |   posts.models\n'
+               'import time:      3000 |       3120 | posts\n')
+        self.assertEqual(parse_importtime(log),
+                         {'posts.models': 120, 'posts': 3000})
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('startup_cost', 'prod', repeat=1, top=2, stdout=out)
+        self.assertIn('prod', out.getvalue())
+        self.assertIn('Slowest imports of prod', out.getvalue())
@@ -0,0 +1,49 @@
+from django.test import Client
+from django.urls import reverse
+from posts.models import Post, User
+from posts.stats import get_author_stats
+from posts.tests.base import PostsTestCase
+
+
+class AuthorStatsTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Writer', email='writer@gmail.com', is_active=True)
+        cls.reader = User.objects.create(
+            username='Reader', email='reader@gmail.com', is_active=True)
+        Post.objects.create(text='First', author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.author_client = Client()
+        self.author_client.force_login(AuthorStatsTest.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(AuthorStatsTest.reader)
+
+    def test_stats_are_cached(self):
+        '''A second profile view does not count posts or followers.'''
+        url = reverse('profile', kwargs={
+            'username': AuthorStatsTest.author.username})
+        guest_client = Client()
+        guest_client.get(url)
+        with self.assertNumQueries(1):
+            response = guest_client.get(url)
+        self.assertEqual(response.context['post_count'], 1)
+
+    def test_follow_and_post_invalidate_stats(self):
+        '''Subscriptions and new posts reset the cached counters.'''
+        self.assertEqual(get_author_stats(AuthorStatsTest.author.id), {
+            'posts': 1, 'followers': 0, 'following': 0})
+        self.reader_client.get(reverse('profile_follow', kwargs={
+            'username': AuthorStatsTest.author.username}))
+        self.author_client.post(reverse('new_post'), data={'text': 'Next'})
+        self.assertEqual(get_author_stats(AuthorStatsTest.author.id), {
+            'posts': 2, 'followers': 1, 'following': 0})
+        self.assertEqual(
+            get_author_stats(AuthorStatsTest.reader.id)['following'], 1)
+        self.reader_client.get(reverse('profile_unfollow', kwargs={
+            'username': AuthorStatsTest.author.username}))
+        self.assertEqual(
+            get_author_stats(AuthorStatsTest.author.id)['followers'], 0)
@@ -0,0 +1,98 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, override_settings
+from django.urls import reverse
+from PIL import Image
+from posts.deletion import delete_posts
+from posts.images import variant_names
+from posts.models import Post, StoredFile, User
+from posts.tests.base import PostsTestCase
+from posts.thumbnails import POST_THUMBNAIL, AsyncThumbnailBackend
+
+
+def image_upload(name, color='teal'):
+    content = io.BytesIO()
+    Image.new('RGB', (600, 400), color).save(content, 'JPEG')
+    return SimpleUploadedFile(name, content.getvalue(),
+                              content_type='image/jpeg')
+
+
+@override_settings(THUMBNAIL_WORKERS=0, DELETION_WORKERS=0)
+class ContentAddressedStorageTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Reposter', email='reposter@gmail.com', is_active=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(ContentAddressedStorageTest.author)
+
+    def upload(self, text, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('new_post'), data={
+                'text': text, 'image': image})
+        return Post.objects.get(text=text)
+
+    def test_same_content_is_stored_once(self):
+        first = default_storage.save('posts/a.txt', ContentFile(b'same'))
+        second = default_storage.save('posts/b.txt', ContentFile(b'same'))
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('posts/'))
+        self.assertEqual(default_storage.references(first), 2)
+        default_storage.delete(first)
+        self.assertTrue(default_storage.exists(first))
+        default_storage.delete(first)
+        self.assertFalse(default_storage.exists(first))
+        self.assertFalse(StoredFile.objects.filter(name=first).exists())
+
+    def test_files_saved_before_are_deleted_at_once(self):
+        name = FileSystemStorage().save('posts/legacy.txt',
+                                        ContentFile(b'legacy'))
+        default_storage.delete(name)
+        self.assertFalse(default_storage.exists(name))
+
+    def test_reposts_share_the_image_and_its_thumbnails(self):
+        first = self.upload('First', image_upload('first.jpg'))
+        second = self.upload('Second', image_upload('copy.jpg'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        geometry, options = POST_THUMBNAIL
+        backend = AsyncThumbnailBackend()
+        self.assertEqual(
+            backend.thumbnail_file(first.image, geometry, dict(options)).name,
+            backend.thumbnail_file(second.image, geometry, dict(options)).name)
+        names = [first.image.name, *variant_names(first.image_variants)]
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_posts(Post.objects.filter(pk=first.pk))
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+        with self.captureOnCommitCallbacks(execute=True):
+            delete_posts(Post.objects.filter(pk=second.pk))
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_replaced_image_is_released(self):
+        post = self.upload('Edited', image_upload('old.jpg', 'red'))
+        old = post.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('edit', kwargs={
+                'username': post.author.username, 'post_id': post.pk}),
+                data={'text': 'Edited',
+                      'image': image_upload('new.jpg', 'blue')})
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old)
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_collector_delete_releases_the_image(self):
+        post = self.upload('Collected', image_upload('gone.jpg', 'green'))
+        names = [post.image.name, *variant_names(post.image_variants)]
+        with self.captureOnCommitCallbacks(execute=True):
+            post.delete()
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+        self.assertFalse(StoredFile.objects.filter(name__in=names).exists())
@@ -0,0 +1,64 @@
+from django.test import Client, TestCase
+from django.urls import reverse
+from posts.models import Comment, Post, User
+from posts.threads import load_replies, load_threads
+
+
+class CommentThreadsTest(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Threads', email='threads@gmail.com', is_active=True)
+        cls.post = Post.objects.create(text='Threads', author=cls.author)
+        cls.roots = [cls.comment(f'Root {num}') for num in range(3)]
+        parent = cls.roots[0]
+        cls.branch = []
+        for num in range(4):
+            parent = cls.comment(f'Reply {num}', parent)
+            cls.branch.append(parent)
+
+    @classmethod
+    def comment(cls, text, parent=None):
+        comment = Comment.objects.create(
+            post=cls.post, author=cls.author, text=text, path=[])
+        comment.path = (parent.path if parent else []) + [comment.id]
+        comment.save()
+        return comment
+
+    def test_page_of_threads_is_one_query(self):
+        '''Threads, replies and authors come from a single query.'''
+        with self.assertNumQueries(1):
+            page = load_threads(CommentThreadsTest.post, per_page=2)
+            names = [[comm.author.username for comm in thread]
+                     for thread in page]
+        self.assertEqual(len(names), 2)
+        self.assertEqual(len(names[0]), 5)
+        with self.assertNumQueries(1):
+            self.assertTrue(page.has_next())
+        last = load_threads(CommentThreadsTest.post, 2, per_page=2)
+        self.assertEqual([thread[0] for thread in last],
+                         [CommentThreadsTest.roots[2]])
+        with self.assertNumQueries(0):
+            self.assertFalse(last.has_next())
+
+    def test_full_last_page_has_no_next(self):
+        page = load_threads(CommentThreadsTest.post, 1, per_page=3)
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_next())
+
+    def test_deep_branch_is_cut(self):
+        '''Replies deeper than max_depth are left for "load more".'''
+        thread = list(load_threads(CommentThreadsTest.post, max_depth=3))[0]
+        self.assertEqual(len(thread), 3)
+        self.assertTrue(thread[-1].has_more_replies)
+        replies = load_replies(thread[-1], max_depth=3)
+        self.assertEqual(
+            [comm.text for comm in replies[0]], ['Reply 2', 'Reply 3'])
+
+    def test_replies_page(self):
+        response = Client().get(reverse('comment_replies', kwargs={
+            'username': CommentThreadsTest.author.username,
+            'post_id': CommentThreadsTest.post.id,
+            'comment_id': CommentThreadsTest.roots[0].id}))
+        self.assertContains(response, 'Reply 3')
@@ -0,0 +1,133 @@
+import io
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+from posts.models import Post, User
+from posts.tests.base import PostsTestCase
+from posts.thumbnails import POST_THUMBNAIL, ThumbnailPool
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+
+
+def image_upload(name='big.jpg', color=(0, 128, 255)):
+    content = io.BytesIO()
+    Image.new('RGB', size=(1200, 800), color=color).save(
+        content, 'JPEG')
+    return SimpleUploadedFile(
+        name, content.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class AsyncThumbnailTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Painter', email='painter@gmail.com', is_active=True)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.client = Client()
+        self.client.force_login(AsyncThumbnailTest.author)
+
+    def thumbnail(self, post):
+        geometry, options = POST_THUMBNAIL
+        return default.backend.get_thumbnail(post.image, geometry, **options)
+
+    def test_render_does_not_resize(self):
+        '''A missing thumbnail is queued and shown as a placeholder.'''
+        post = Post.objects.create(
+            text='Fresh', author=AsyncThumbnailTest.author,
+            image=image_upload())
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            response = Client().get(reverse('index'))
+        get_image.assert_not_called()
+        self.assertContains(response, 'thumbnail-placeholder')
+        self.assertIsNone(self.thumbnail(post))
+
+    def test_upload_needs_no_thumbnail(self):
+        '''Uploaded images are shown by their srcset variants.'''
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('new_post'), data={
+                'text': 'Uploaded', 'image': image_upload()})
+        with mock.patch.object(default.engine, 'get_image') as get_image:
+            response = Client().get(reverse('index'))
+        get_image.assert_not_called()
+        self.assertContains(response, '<picture>')
+        self.assertNotContains(response, 'thumbnail-placeholder')
+
+    def test_thumbnails_are_named_by_sorl(self):
+        '''sorl fills in the options the name depends on.'''
+        geometry, options = POST_THUMBNAIL
+
+        def name():
+            return default.backend.thumbnail_file(
+                'posts/picture.png', geometry, dict(options)).name
+
+        self.assertTrue(name().endswith('.jpg'))
+        # sorl copies its settings once, override_settings does not reach
+        with mock.patch.object(sorl_settings, 'THUMBNAIL_PRESERVE_FORMAT',
+                               True):
+            self.assertTrue(name().endswith('.png'))
+
+
+@override_settings(THUMBNAIL_WORKERS=1)
+class ThumbnailPoolTest(PostsTestCase):
+    def test_same_thumbnail_is_queued_once(self):
+        pool = ThumbnailPool()
+        pool.pending.add(('a.jpg', '10x10', ()))
+        with mock.patch('posts.thumbnails.ThreadPoolExecutor') as executor:
+            pool.submit('a.jpg', '10x10', {})
+            executor.assert_not_called()
+            pool.submit('b.jpg', '10x10', {})
+        executor.return_value.submit.assert_called_once_with(
+            pool.run, ('b.jpg', '10x10', ()))
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class ThumbnailPrefetchTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Archivist', email='archivist@gmail.com',
+            is_active=True)
+        # distinct images uploaded before the srcset variants
+        cls.posts = [Post.objects.create(
+            text=f'Old {num}', author=cls.author,
+            image=image_upload(f'old{num}.jpg', (num * 20, 0, 0)))
+            for num in range(10)]
+
+    def kvstore_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            with mock.patch('posts.thumbnails.schedule'):
+                response = Client().get(reverse('index'))
+        return response, [query for query in queries.captured_queries
+                          if 'thumbnail_kvstore' in query['sql']]
+
+    def test_page_is_one_kvstore_round_trip(self):
+        response, queries = self.kvstore_queries()
+        self.assertEqual(len(queries), 1)
+        self.assertContains(response, 'thumbnail-placeholder', count=10)
+        caches['feeds'].clear()
+        _, queries = self.kvstore_queries()
+        self.assertEqual(queries, [])
+
+    def test_ready_thumbnails_are_shown(self):
+        post = ThumbnailPrefetchTest.posts[0]
+        geometry, options = POST_THUMBNAIL
+        thumbnail = default.backend.thumbnail_file(
+            post.image, geometry, dict(options))
+        content = io.BytesIO()
+        Image.new('RGB', (960, 339)).save(content, 'JPEG')
+        thumbnail.write(content.getvalue())
+        default.kvstore.set(thumbnail)
+        response, _ = self.kvstore_queries()
+        self.assertContains(response, f'src="{thumbnail.url}"')
+        self.assertContains(response, 'thumbnail-placeholder', count=9)
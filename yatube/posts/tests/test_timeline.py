@@ -0,0 +1,81 @@
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from posts.models import Follow, Post, TimelineEntry, User
+from posts.tests.base import PostsTestCase
+
+
+class TimelineTest(PostsTestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='Blogger', email='blogger@gmail.com', is_active=True)
+        cls.reader = User.objects.create(
+            username='Fan', email='fan@gmail.com', is_active=True)
+        cls.old_post = Post.objects.create(text='Old', author=cls.author)
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.reader_client = Client()
+        self.reader_client.force_login(TimelineTest.reader)
+        self.author_client = Client()
+        self.author_client.force_login(TimelineTest.author)
+
+    def follow_feed(self):
+        response = self.reader_client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def test_follow_post_and_unfollow(self):
+        '''Follow backfills, new posts fan out and unfollow prunes.'''
+        self.reader_client.get(reverse('profile_follow', kwargs={
+            'username': TimelineTest.author.username}))
+        self.assertEqual(self.follow_feed(), ['Old'])
+        self.author_client.post(reverse('new_post'), data={'text': 'New'})
+        self.assertEqual(self.follow_feed(), ['New', 'Old'])
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=TimelineTest.reader).count(), 2)
+        self.reader_client.get(reverse('profile_unfollow', kwargs={
+            'username': TimelineTest.author.username}))
+        self.assertEqual(self.follow_feed(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_cursor_pages_follow_the_timeline_index(self):
+        '''Cursor pages of the follow feed are ordered by the timeline.'''
+        self.reader_client.get(reverse('profile_follow', kwargs={
+            'username': TimelineTest.author.username}))
+        for num in range(12):
+            self.author_client.post(reverse('new_post'),
+                                    data={'text': f'Post {num}'})
+        url = reverse('follow_index')
+        with CaptureQueriesContext(connection) as queries:
+            first = self.reader_client.get(url, {'cursor': ''}).context['page']
+        self.assertTrue(any(
+            'ORDER BY "timeline_pub_date" DESC' in query['sql']
+            for query in queries.captured_queries))
+        second = self.reader_client.get(
+            url, {'cursor': first.next_cursor}).context['page']
+        texts = [post.text for post in [*first, *second]]
+        self.assertEqual(texts, [f'Post {num}' for num in range(11, -1, -1)]
+                         + ['Old'])
+
+    def test_deleted_post_leaves_timeline(self):
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author)
+        self.author_client.get(reverse('delete', kwargs={
+            'username': TimelineTest.author.username,
+            'post_id': TimelineTest.old_post.id}))
+        self.assertEqual(self.follow_feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_popular_author_is_merged_on_read(self):
+        '''Posts of authors over the follower limit are not copied.'''
+        Follow.objects.create(
+            user=TimelineTest.reader, author=TimelineTest.author)
+        caches['timeline'].clear()
+        Post.objects.create(text='Popular', author=TimelineTest.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post__text='Popular').count(), 0)
+        self.assertEqual(self.follow_feed(), ['Popular', 'Old'])
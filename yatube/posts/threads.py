@@ -0,0 +1,106 @@
+from django.db.models import Subquery
+
+from .avatars import attach_avatars
+from .models import Comment
+
+THREADS_PER_PAGE = 20
+MAX_DEPTH = 6
+
+
+class ThreadPage:
+    '''A page of top-level comments, each followed by its replies.
+
+    later_roots are the top-level comments after the page, or None when
+    the page is not full; they are only looked up if has_next is asked.
+    '''
+
+    def __init__(self, threads, number, later_roots=None):
+        self.threads = threads
+        self.number = number
+        self._later_roots = later_roots
+        self._has_next = None
+
+    def __iter__(self):
+        return iter(self.threads)
+
+    def __len__(self):
+        return len(self.threads)
+
+    def has_next(self):
+        if self._has_next is None:
+            self._has_next = (self._later_roots is not None
+                              and self._later_roots.exists())
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+def page_number(value):
+    try:
+        return max(int(value), 1)
+    except (TypeError, ValueError):
+        return 1
+
+
+def group_threads(comments, root_depth, max_depth):
+    '''Folds comments ordered by path into threads cut at max_depth.
+
+    A comment whose replies lie deeper than the cut is marked with
+    has_more_replies instead.
+    '''
+    threads = []
+    by_id = {}
+    for comment in comments:
+        depth = len(comment.path) - root_depth
+        if depth > max_depth:
+            by_id[comment.path[-2]].has_more_replies = True
+            continue
+        comment.has_more_replies = False
+        by_id[comment.id] = comment
+        if depth == 1:
+            threads.append([comment])
+        else:
+            threads[-1].append(comment)
+    return threads
+
+
+def load_threads(post, number=1, per_page=THREADS_PER_PAGE,
+                 max_depth=MAX_DEPTH):
+    '''Loads a page of threads of a post with a single query.
+
+    Whether there is a next page takes one more, on the root index.
+    '''
+    number = page_number(number)
+    offset = (number - 1) * per_page
+    all_roots = Comment.objects.filter(post=post, path__len=1)
+    roots = all_roots.order_by('path').values('id')[offset:offset + per_page]
+    comments = Comment.objects.filter(
+        post=post, path__0__in=Subquery(roots),
+        path__len__lte=max_depth + 1).select_related(
+            'author').order_by('path')
+    threads = group_threads(comments, 0, max_depth)
+    attach_avatars(comment.author for thread in threads for comment in thread)
+    later_roots = None
+    if len(threads) == per_page:
+        later_roots = all_roots.filter(path__gt=threads[-1][0].path)
+    return ThreadPage(threads, number, later_roots)
+
+
+def load_replies(comment, max_depth=MAX_DEPTH):
+    '''Loads the replies of a comment down to max_depth more levels.'''
+    root_depth = len(comment.path)
+    replies = Comment.objects.filter(
+        post_id=comment.post_id, path__contains=[comment.id],
+        path__len__gt=root_depth,
+        path__len__lte=root_depth + max_depth + 1).select_related(
+            'author').order_by('path')
+    threads = group_threads(replies, root_depth, max_depth)
+    attach_avatars(comment.author for thread in threads for comment in thread)
+    return threads
@@ -0,0 +1,173 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE, KVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from .instrumentation import span
+
+logger = logging.getLogger(__name__)
+
+POST_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+AVATAR_THUMBNAIL = ('160x160', {'crop': 'center', 'upscale': True})
+
+
+def generate(name, geometry, **options):
+    '''Creates the thumbnail right away, as plain sorl does.'''
+    with span('thumbnail'):
+        return ThumbnailBackend().get_thumbnail(name, geometry, **options)
+
+
+class ThumbnailPool:
+    '''Generates thumbnails in background threads, each one only once.'''
+
+    def __init__(self):
+        self.executor = None
+        self.pending = set()
+        self.lock = threading.Lock()
+
+    def submit(self, name, geometry, options):
+        if not settings.THUMBNAIL_WORKERS:
+            generate(name, geometry, **options)
+            return
+        task = (name, geometry, tuple(sorted(options.items())))
+        with self.lock:
+            if task in self.pending:
+                return
+            self.pending.add(task)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    settings.THUMBNAIL_WORKERS,
+                    thread_name_prefix='thumbnails')
+        self.executor.submit(self.run, task)
+
+    def run(self, task):
+        name, geometry, options = task
+        try:
+            generate(name, geometry, **dict(options))
+        except Exception:
+            logger.exception('Thumbnail %s of %s failed', geometry, name)
+        finally:
+            with self.lock:
+                self.pending.discard(task)
+            connections.close_all()
+
+
+pool = ThumbnailPool()
+
+
+def schedule(image, geometry, **options):
+    '''Queues a thumbnail once the current transaction commits.'''
+    if image:
+        name = getattr(image, 'name', image)
+        transaction.on_commit(lambda: pool.submit(name, geometry, options))
+
+
+class ThumbnailNamed(Exception):
+    def __init__(self, thumbnail):
+        super().__init__(thumbnail.name)
+        self.thumbnail = thumbnail
+
+
+class ThumbnailNamer(ThumbnailBackend):
+    '''sorl's backend stopped as soon as it has named a thumbnail.
+
+    The name, and so the key value store key, depends on how sorl fills in
+    the options; letting it do that keeps the names the same as its own.
+    '''
+
+    def _get_thumbnail_filename(self, source, geometry_string, options):
+        name = super()._get_thumbnail_filename(
+            source, geometry_string, options)
+        raise ThumbnailNamed(ImageFile(name, default.storage))
+
+
+class AsyncThumbnailBackend(ThumbnailBackend):
+    '''Returns only thumbnails that are ready and queues the missing ones.
+
+    A missing thumbnail is returned as None, so the {% thumbnail %} tag
+    renders its {% empty %} placeholder instead of resizing in the request.
+    '''
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        try:
+            ThumbnailNamer().get_thumbnail(file_, geometry_string, **options)
+        except ThumbnailNamed as named:
+            return named.thumbnail
+        raise AssertionError('sorl returned a thumbnail without naming it')
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.thumbnail_file(file_, geometry_string, dict(options))
+        cached = default.kvstore.get(thumbnail)
+        if cached is None:
+            schedule(file_, geometry_string, **options)
+        return cached
+
+
+class CachedDBKVStore(KVStore):
+    '''sorl's cached database store, able to look up many images at once.'''
+
+    def get_many(self, image_files):
+        '''The stored images by key, missing ones are left out.
+
+        One get_many on the cache, and one query for the keys it misses,
+        which are then cached the way sorl caches a single lookup.
+        '''
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(list(keys))
+        missing = [key for key in keys if key not in values]
+        if missing:
+            stored = dict(KVStoreModel.objects.filter(
+                key__in=missing).values_list('key', 'value'))
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fetched,
+                                sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+            values.update(fetched)
+        return {keys[key]: deserialize_image_file(value)
+                for key, value in values.items()
+                if value and value != EMPTY_VALUE}
+
+
+def lookup(files, geometry, options):
+    '''Ready thumbnails of many files by name, in one kvstore round trip.
+
+    Missing thumbnails are None and are queued, as the thumbnail tag does.
+    '''
+    backend = default.backend
+    thumbnails = {getattr(file_, 'name', file_): backend.thumbnail_file(
+        file_, geometry, dict(options)) for file_ in files}
+    found = default.kvstore.get_many(thumbnails.values())
+    ready = {}
+    for name, thumbnail in thumbnails.items():
+        ready[name] = found.get(thumbnail.key)
+        if ready[name] is None:
+            schedule(name, geometry, **options)
+    return ready
+
+
+def attach_thumbnails(posts):
+    '''Sets post.feed_thumbnail on a page of posts.
+
+    Only images uploaded before the srcset variants need one, it is None
+    for the rest and while it is being generated.
+    '''
+    posts = list(posts)
+    legacy = [post.image for post in posts
+              if post.image and not post.image_variants]
+    geometry, options = POST_THUMBNAIL
+    ready = lookup(legacy, geometry, options) if legacy else {}
+    for post in posts:
+        post.feed_thumbnail = (
+            ready.get(post.image.name) if post.image else None)
+    return posts
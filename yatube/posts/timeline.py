@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count, F, Q
+from django.utils.connection import ConnectionProxy
+
+from .models import Follow, Post, TimelineEntry
+
+cache = ConnectionProxy(caches, 'timeline')
+
+FANOUT_ON_READ_KEY = 'timeline:fanout_on_read'
+PREVIOUS_FANOUT_ON_READ_KEY = 'timeline:fanout_on_read:previous'
+
+# follow feeds are ordered and paginated by this annotation, which reads
+# the copy of pub_date in the timeline index when there is one
+TIMELINE_ORDERING = 'timeline_pub_date'
+
+FILL_SQL = '''
+    INSERT INTO {timeline} (user_id, post_id, pub_date)
+    SELECT follow.user_id, post.id, post.pub_date
+    FROM {follow} follow
+    JOIN {post} post ON post.author_id = follow.author_id
+    WHERE {where}
+    ON CONFLICT (user_id, post_id) DO NOTHING
+'''
+
+
+def fill_timelines(where, params):
+    '''Copies posts of followed authors into timelines with one INSERT.'''
+    sql = FILL_SQL.format(
+        timeline=TimelineEntry._meta.db_table,
+        follow=Follow._meta.db_table,
+        post=Post._meta.db_table,
+        where=where)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def fanout_on_read_authors():
+    '''Authors with too many followers to copy their posts on write.
+
+    Their posts are merged into follow feeds at read time instead. An author
+    who drops below the limit gets the posts written meanwhile fanned out.
+    '''
+    authors = cache.get(FANOUT_ON_READ_KEY)
+    if authors is None:
+        authors = set(Follow.objects.values('author').annotate(
+            followers=Count('id')).filter(
+                followers__gte=settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        ).values_list('author', flat=True))
+        dropped = cache.get(PREVIOUS_FANOUT_ON_READ_KEY, set()) - authors
+        if dropped:
+            fill_timelines('follow.author_id = ANY(%s)', [list(dropped)])
+        cache.set(PREVIOUS_FANOUT_ON_READ_KEY, authors, None)
+        cache.set(FANOUT_ON_READ_KEY, authors,
+                  settings.TIMELINE_FANOUT_REFRESH)
+    return authors
+
+
+def fan_out(post):
+    '''Adds a new post to the timelines of its author's followers.'''
+    if post.author_id not in fanout_on_read_authors():
+        fill_timelines('post.id = %s', [post.id])
+
+
+def backfill(user_id, author_id):
+    if author_id not in fanout_on_read_authors():
+        fill_timelines('follow.user_id = %s AND follow.author_id = %s',
+                       [user_id, author_id])
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def rebuild_timelines():
+    TimelineEntry.objects.all().delete()
+    fill_timelines('NOT (follow.author_id = ANY(%s))',
+                   [list(fanout_on_read_authors())])
+
+
+def timeline_posts(user):
+    '''Posts of the authors the user follows, newest first.'''
+    celebrities = fanout_on_read_authors()
+    followed = []
+    if celebrities:
+        followed = list(Follow.objects.filter(
+            user=user, author__in=celebrities).values_list(
+                'author', flat=True))
+    if not followed:
+        posts = Post.objects.filter(timeline_entries__user=user).annotate(
+            **{TIMELINE_ORDERING: F('timeline_entries__pub_date')})
+    else:
+        posts = Post.objects.filter(
+            Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+            | Q(author__in=followed)).annotate(
+                **{TIMELINE_ORDERING: F('pub_date')})
+    return posts.order_by(f'-{TIMELINE_ORDERING}', '-id')
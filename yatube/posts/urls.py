@@ -7,6 +7,7 @@ urlpatterns = [
     path("group/<slug:slug>/", views.group_posts, name='group'),
     path('new/', views.new_post, name='new_post'),
     path("follow/", views.follow_index, name="follow_index"),
+    path("search/", views.search, name="search"),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit, name='edit'),
@@ -14,9 +15,15 @@ urlpatterns = [
          name='delete'),
     path("<str:username>/<int:post_id>/comment/", views.add_comment,
          name="add_comment"),
+    path("<str:username>/<int:post_id>/comment/<int:comment_id>/",
+         views.comment_replies,
+         name="comment_replies"),
     path("<str:username>/<int:post_id>/comment/<int:comment_id>/edit",
          views.comment_edit,
          name="edit_comment"),
+    path("<str:username>/<int:post_id>/comment/<int:comment_id>/delete/",
+         views.comment_delete,
+         name="delete_comment"),
     path("<str:username>/follow/", views.profile_follow,
          name="profile_follow"),
     path("<str:username>/unfollow/", views.profile_unfollow,
@@ -1,12 +1,23 @@
-from functools import reduce
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.contrib import auth
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.http import require_http_methods
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_http_methods
 
+from .caching import feed_etag, feed_last_modified, feed_page
+from .counters import view_counter
+from .deletion import delete_posts
 from .forms import CommentForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .paginators import CursorPaginator
+from .routers import replica_reads
+from .search import add_headlines, search_posts
+from .services import create_comment, delete_comment
+from .stats import get_author_stats
+from .threads import load_replies, load_threads
+from .thumbnails import attach_thumbnails
+from .timeline import TIMELINE_ORDERING, timeline_posts
 
 POSTS_PER_PAGE = 10
 
@@ -24,67 +35,88 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
-def pageproducer(request, list, emount_of_pages):
+def pageproducer(request, list, emount_of_pages, field='pub_date'):
+    if 'cursor' in request.GET or (
+            settings.FEED_CURSOR_PAGINATION and 'page' not in request.GET):
+        paginator = CursorPaginator(list, emount_of_pages, field)
+        page = paginator.get_page(request.GET.get('cursor'))
+        attach_thumbnails(page)
+        return page
     paginator = Paginator(list, emount_of_pages)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
+    attach_thumbnails(page)
     return page
 
 
+@replica_reads
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def index(request):
-    post_list = Post.objects.select_related(
-        'author').select_related('group').prefetch_related('comments')
-    page = pageproducer(request, post_list, POSTS_PER_PAGE)
+    post_list = Post.objects.feed()
+    context = feed_page(
+        request, lambda: pageproducer(request, post_list, POSTS_PER_PAGE))
     return render(request, 'index.html',
-                  {'page': page, 'all': True, 'follow': False})
+                  {**context, 'all': True, 'follow': False})
 
 
+@replica_reads
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author').prefetch_related('comments')
-    page = pageproducer(request, posts, POSTS_PER_PAGE)
-    return render(request, "group.html", {"group": group, 'page': page, })
+    posts = group.posts.feed()
+    context = feed_page(
+        request, lambda: pageproducer(request, posts, POSTS_PER_PAGE))
+    return render(request, "group.html", {**context, "group": group, })
 
 
+@replica_reads
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = Post.objects.filter(
-        author=author).select_related('author').select_related(
-            'group').prefetch_related('comments')
-    page = pageproducer(request, posts, POSTS_PER_PAGE)
-    post_count = posts.count()
+    posts = Post.objects.filter(author=author).feed()
+    context = feed_page(
+        request, lambda: pageproducer(request, posts, POSTS_PER_PAGE))
+    stats = get_author_stats(author.id)
     user = request.user
     following = (request.user.is_authenticated
                  and Follow.objects.filter(user=user, author=author).exists())
-    follow = Follow.objects.filter(user=author).count()
-    followers = Follow.objects.filter(author=author).count()
     return render(request, 'profile.html', {
-        "author": author, "page": page, "post_count": post_count, "user": user,
-        "followers": followers, "following": following, 'follow': follow, })
+        **context, "author": author, "post_count": stats['posts'],
+        "user": user, "followers": stats['followers'],
+        "following": following, 'follow': stats['following'], })
 
 
-def group_comm(result, comment):
-    if len(comment.path) == 1:
-        result.append([comment])
-    else:
-        result[-1].append(comment)
-    return result
+@replica_reads
+def post_view(request, username, post_id, comm_new=True):
+    response = conditional_post_view(request, username, post_id, comm_new)
+    # a 304 skips the view, but the reader has seen the post all the same
+    if response.status_code == 304:
+        view_counter.hit(post_id)
+    return response
 
 
-def post_view(request, username, post_id, comm_new=True):
+@condition(etag_func=feed_etag, last_modified_func=feed_last_modified)
+def conditional_post_view(request, username, post_id, comm_new=True):
     author = get_object_or_404(User, username=username)
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    post.counter += 1
-    post.save()
+    post = get_object_or_404(author.posts, id=post_id)
+    post.counter += view_counter.hit(post.id)
     form = CommentForm()
-    comments = Comment.objects.filter(post__id=post_id).order_by('path')
-    comment_groups = reduce(group_comm, comments, [])
-    print(comment_groups)
-    post_count = Post.objects.filter(author__username=username).count()
-    return render(request, 'post.html', {"post": post, "author": author,
-                  "post_count": post_count, "user": request.user,
-                                         "comments": comment_groups,
-                                         "form": form, 'comm_new': comm_new})
+    comment_groups = load_threads(post, request.GET.get('comments'))
+    stats = get_author_stats(author.id)
+    return render(request, 'post.html', {
+        "post": post, "author": author, "post_count": stats['posts'],
+        "user": request.user, "followers": stats['followers'],
+        "follow": stats['following'], "comments": comment_groups,
+        "form": form, 'comm_new': comm_new})
+
+
+def comment_replies(request, username, post_id, comment_id):
+    comment = get_object_or_404(
+        Comment.objects.select_related('author', 'post__author'),
+        pk=comment_id, post_id=post_id, post__author__username=username)
+    return render(request, 'comment_replies.html', {
+        "post": comment.post, "author": comment.post.author,
+        "comment": comment, "comments": load_replies(comment)})
 
 
 @login_required
@@ -93,9 +125,8 @@ def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
-            new_post = form.save(commit=False)
-            new_post.author = author
-            new_post.save()
+            form.instance.author = author
+            form.save()
             return redirect('index')
     return render(request, 'new_post.html', {'form': form,
                   'post_new': True, })
@@ -111,9 +142,8 @@ def post_edit(request, username, post_id):
         request.POST or None, files=request.FILES or None, instance=post)
     if request.method == 'POST':
         if form.is_valid():
-            new_post = form.save(commit=False)
-            new_post.author = request.user
-            new_post.save()
+            form.instance.author = request.user
+            new_post = form.save()
             return redirect('post', username=new_post.author.username,
                             post_id=new_post.id)
     return render(request, 'new_post.html', {'form': form, 'post': post, })
@@ -127,21 +157,11 @@ def add_comment(request, username, post_id):
     form = CommentForm(
         request.POST or None)
     if form.is_valid():
-        new_comm = Comment()
-        new_comm.path = []
-        new_comm.author = auth.get_user(request)
-        new_comm.post = post
-        new_comm.text = form.cleaned_data['text']
-        parent_id = form.cleaned_data['parent_comment']
-        new_comm.save()
-        if parent_id:
-            new_comm.path.extend(
-                Comment.objects.get(
-                    id=parent_id).path)
-            new_comm.path.append(new_comm.id)
-        else:
-            new_comm.path.append(new_comm.id)
-        new_comm.save()
+        try:
+            create_comment(post, request.user, form.cleaned_data['text'],
+                           form.cleaned_data['parent_comment'])
+        except Comment.DoesNotExist:
+            pass
     return redirect('post', username=post.author.username,
                     post_id=post.id)
 
@@ -151,7 +171,6 @@ def add_comment(request, username, post_id):
 def comment_edit(request, username, post_id, comment_id=None):
     post = get_object_or_404(Post, pk=post_id)
     comment = CommentForm.cleaned_data['text']
-    print(CommentForm.cleaned_data['text'])
     if comment.author != request.user:
         return redirect('post', post_id=post_id, username=post.author.username)
 
@@ -166,11 +185,37 @@ def comment_edit(request, username, post_id, comment_id=None):
 
 
 @login_required
+@require_http_methods(["POST"])
+def comment_delete(request, username, post_id, comment_id):
+    comment = get_object_or_404(
+        Comment, pk=comment_id, post_id=post_id,
+        post__author__username=username)
+    if request.user.username in (comment.author.username, username):
+        delete_comment(comment)
+    return redirect('post', username=username, post_id=post_id)
+
+
+@replica_reads
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        posts = search_posts(query).feed()
+        page = Paginator(posts, POSTS_PER_PAGE).get_page(
+            request.GET.get('page'))
+        add_headlines(page, query)
+        attach_thumbnails(page)
+    return render(request, 'search.html', {
+        'page': page, 'query': query,
+        'page_query': urlencode({'q': query}) + '&', })
+
+
+@login_required
+@replica_reads
+@condition(etag_func=feed_etag)
 def follow_index(request):
-    post_list = Post.objects.filter(
-        author__following__user=request.user).select_related(
-            'author').select_related('group').prefetch_related('comments')
-    page = pageproducer(request, post_list, POSTS_PER_PAGE)
+    post_list = timeline_posts(request.user).feed()
+    page = pageproducer(request, post_list, POSTS_PER_PAGE, TIMELINE_ORDERING)
     return render(request, "follow.html", {'page': page, 'follow': True,
                                            'all': False, })
 
@@ -196,6 +241,5 @@ def post_delete(request, username, post_id):
     author = get_object_or_404(User, username=username)
     if author != request.user:
         return redirect('profile', username=author.username)
-    Post.objects.filter(
-        pk=post_id, author__username=request.user.username).delete()
+    delete_posts(Post.objects.filter(pk=post_id, author=request.user))
     return redirect('profile', username=request.user)
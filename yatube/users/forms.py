@@ -1,5 +1,8 @@
 from django.contrib.auth.forms import UserCreationForm
+from django.db import transaction
 
+from posts.images import (AVATAR_IMAGE, discard_unreferenced, save_processed,
+                          validate_image_upload, variant_names)
 from posts.models import User
 
 
@@ -8,3 +11,25 @@ class CreationForm(UserCreationForm):
         model = User
         fields = (
             "first_name", "last_name", "username", "email", "avatar", "bio")
+
+    def clean_avatar(self):
+        avatar = self.cleaned_data['avatar']
+        if avatar:
+            validate_image_upload(avatar)
+        return avatar
+
+    def save(self, commit=True):
+        # comments and the admin show a variant, no thumbnail is made
+        avatar = self.cleaned_data.get('avatar')
+        written = []
+        try:
+            with transaction.atomic():
+                if avatar:
+                    self.instance.avatar_variants = save_processed(
+                        self.instance.avatar, avatar, AVATAR_IMAGE)
+                    written = [self.instance.avatar.name, *variant_names(
+                        self.instance.avatar_variants)]
+                return super().save(commit)
+        except Exception:
+            discard_unreferenced(written)
+            raise
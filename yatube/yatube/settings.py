@@ -1,5 +1,7 @@
 import os
+import sys
 from distutils.util import strtobool
+from importlib.util import find_spec
 
 import dotenv
 
@@ -16,6 +18,16 @@ DEBUG = bool(strtobool(os.environ.get('DEBUG', 'False')))
 
 ALLOWED_HOSTS = os.environ.get('ALLOWED_HOSTS', '*')
 
+# Settings profile: dev, test or prod. Only dev loads the debug toolbar and
+# serves media and static files, see the end of this file. Without
+# SETTINGS_PROFILE test runs get test and the rest follows DEBUG.
+RUNNING_TESTS = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+SETTINGS_PROFILE = os.environ.get(
+    'SETTINGS_PROFILE',
+    'test' if RUNNING_TESTS else 'dev' if DEBUG else 'prod')
+if SETTINGS_PROFILE not in ('dev', 'test', 'prod'):
+    raise ValueError(f'Unknown SETTINGS_PROFILE {SETTINGS_PROFILE!r}')
+
 
 # Application definition
 
@@ -23,6 +35,7 @@ INSTALLED_APPS = [
     'about',
     'users',
     'posts',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -31,18 +44,19 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.template.context_processors',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.instrumentation.InstrumentationMiddleware',
+    'posts.middleware.ReplicaStickinessMiddleware',
+    'posts.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -54,7 +68,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'posts.instrumentation.InstrumentedTemplates',
         "DIRS": [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -82,8 +96,35 @@ DATABASES = {
         'PASSWORD': 'covid2019',
         'HOST': 'localhost',
         'PORT': '',
+        # connections are kept open between requests; put pgbouncer in
+        # front for pooling across workers (transaction pooling needs
+        # DATABASE_DISABLE_SERVER_SIDE_CURSORS)
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'DISABLE_SERVER_SIDE_CURSORS': bool(strtobool(os.environ.get(
+            'DATABASE_DISABLE_SERVER_SIDE_CURSORS', 'False'))),
     }
 }
+# Reused connections idle for DATABASE_HEALTH_CHECK_IDLE seconds are pinged
+# at the start of a request and reopened if the server has dropped them
+# (see posts.signals.check_connections).
+DATABASE_HEALTH_CHECKS = bool(strtobool(
+    os.environ.get('DATABASE_HEALTH_CHECKS', 'True')))
+DATABASE_HEALTH_CHECK_IDLE = int(
+    os.environ.get('DATABASE_HEALTH_CHECK_IDLE', 30))
+
+# Read-only views (see posts.routers.replica_reads) read from the replicas
+# listed in DATABASE_REPLICAS as comma separated host[:port]. A client that
+# has just written reads from the primary for REPLICA_STICKY_SECONDS.
+REPLICA_DATABASES = []
+for number, replica in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICAS', '').split(','))):
+    host, _, port = replica.strip().partition(':')
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'], 'HOST': host, 'PORT': port,
+        'TEST': {'MIRROR': 'default'}}
+    REPLICA_DATABASES.append(f'replica{number}')
+DATABASE_ROUTERS = ['posts.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
 
 
 # Password validation
@@ -141,8 +182,173 @@ LOGOUT_REDIRECT_URL = "index"
 EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
 
+# Cache backend shared by all workers. CACHE_BACKEND picks one of the
+# backends below; CACHE_LOCATION is the server list (comma separated) for
+# memcached and redis, a directory for file and a table name for db.
+# Every subsystem gets its own alias and key prefix, and CACHE_VERSION
+# invalidates all keys at once.
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+}
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', '')
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'yatube')
+CACHE_VERSION = int(os.environ.get('CACHE_VERSION', 1))
+CACHE_NAMESPACES = (
+    'default', 'counters', 'stats', 'feeds', 'timeline', 'avatars')
+
+
+def cache_location(namespace):
+    if CACHE_BACKEND in ('memcached', 'redis'):
+        return CACHE_LOCATION.split(',')
+    if CACHE_BACKEND == 'file':
+        return os.path.join(
+            CACHE_LOCATION or os.path.join(BASE_DIR, 'cache'), namespace)
+    if CACHE_BACKEND == 'db':
+        return CACHE_LOCATION or 'yatube_cache'
+    return namespace
+
+
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    namespace: {
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': cache_location(namespace),
+        'KEY_PREFIX': f'{CACHE_KEY_PREFIX}:{namespace}',
+        'VERSION': CACHE_VERSION,
     }
+    for namespace in CACHE_NAMESPACES
 }
+
+# Post views are buffered by every worker and written to Post.counter in
+# bulk once per interval by a background thread (see posts.counters), when
+# the worker exits and on manage.py flush_view_counts; 0 writes every view
+# right away, the default of tests.
+VIEW_COUNTER_FLUSH_INTERVAL = int(os.environ.get(
+    'VIEW_COUNTER_FLUSH_INTERVAL', 0 if SETTINGS_PROFILE == 'test' else 30))
+
+# Feeds paginate by (pub_date, id) cursors instead of page numbers. A
+# ?cursor= parameter switches a single request to cursor mode either way.
+FEED_CURSOR_PAGINATION = bool(strtobool(
+    os.environ.get('FEED_CURSOR_PAGINATION', 'False')))
+
+# Post, follower and following counts shown on profiles are cached per
+# author and invalidated when posts or subscriptions change.
+AUTHOR_STATS_TIMEOUT = int(os.environ.get('AUTHOR_STATS_TIMEOUT', 60 * 60))
+
+# Follow feeds are materialized per user when a post is written. Authors
+# with at least TIMELINE_FANOUT_MAX_FOLLOWERS followers are merged into the
+# feed at read time instead; that list is refreshed every
+# TIMELINE_FANOUT_REFRESH seconds.
+TIMELINE_FANOUT_MAX_FOLLOWERS = int(
+    os.environ.get('TIMELINE_FANOUT_MAX_FOLLOWERS', 10000))
+TIMELINE_FANOUT_REFRESH = int(os.environ.get('TIMELINE_FANOUT_REFRESH', 600))
+
+# Anonymous visitors share rendered feed pages for this many seconds
+# (0 turns it off). Any post or comment change invalidates them.
+FEED_PAGE_CACHE_TIMEOUT = int(os.environ.get('FEED_PAGE_CACHE_TIMEOUT', 15))
+
+# Feed and post pages answer conditional requests with 304, see
+# posts.caching. Their validator is kept in the feeds cache, so in prod
+# this needs a backend the workers share: with locmem a worker that did
+# not see a change would keep answering 304.
+CONDITIONAL_FEEDS = bool(strtobool(os.environ.get(
+    'CONDITIONAL_FEEDS',
+    str(CACHE_BACKEND != 'locmem' or SETTINGS_PROFILE != 'prod'))))
+
+# Thumbnails are never resized inside a request: missing ones are rendered
+# as placeholders and generated by THUMBNAIL_WORKERS background threads
+# (0 generates them inline, once the upload is committed).
+THUMBNAIL_BACKEND = 'posts.thumbnails.AsyncThumbnailBackend'
+# feeds look the thumbnails of a whole page up at once, see
+# posts.thumbnails.attach_thumbnails
+THUMBNAIL_KVSTORE = 'posts.thumbnails.CachedDBKVStore'
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Requests running more than QUERY_BUDGET queries (views can set their own
+# with posts.middleware.query_budget) are logged to posts.queries, or fail
+# with QueryBudgetExceeded when QUERY_BUDGET_STRICT is set, as in CI.
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 30))
+QUERY_BUDGET_STRICT = bool(strtobool(
+    os.environ.get('QUERY_BUDGET_STRICT', 'False')))
+
+# Stored results of manage.py benchmark that later runs are compared with.
+BENCHMARK_BASELINE = os.environ.get(
+    'BENCHMARK_BASELINE', os.path.join(BASE_DIR, 'benchmark.json'))
+
+# Request instrumentation, see posts.instrumentation. The instrument
+# management command switches it at runtime, these values apply until then.
+INSTRUMENTATION_METRICS = bool(strtobool(
+    os.environ.get('INSTRUMENTATION_METRICS', 'False')))
+# share of requests profiled with cProfile, and the view names to sample
+PROFILE_RATE = float(os.environ.get('PROFILE_RATE', 0))
+PROFILE_VIEWS = [
+    name for name in os.environ.get('PROFILE_VIEWS', '').split(',') if name]
+PROFILE_DIR = os.environ.get('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+# seconds a worker keeps the switches and the metrics before syncing them
+INSTRUMENTATION_REFRESH = int(os.environ.get('INSTRUMENTATION_REFRESH', 10))
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))
+# bearer token of the Prometheus scraper; without one /metrics is a 404
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Development only apps, installed when the dev profile is on and the
+# package is there. Importing and running them costs every worker.
+DEV_APPS = {
+    'debug_toolbar': ['debug_toolbar.middleware.DebugToolbarMiddleware'],
+}
+# media and static files are served by Django only in dev
+SERVE_FILES = SETTINGS_PROFILE == 'dev'
+if SETTINGS_PROFILE == 'dev':
+    for app, middleware in DEV_APPS.items():
+        if find_spec(app) is not None:
+            INSTALLED_APPS.append(app)
+            MIDDLEWARE.extend(middleware)
+
+if SETTINGS_PROFILE == 'test':
+    # hashing is a large share of the time of tests that create users
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+# Posts and users are deleted in batches of this many rows, see
+# posts.deletion. Users are deleted and files cleaned up by background
+# threads; 0 workers does it in the request instead.
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', 500))
+DELETION_WORKERS = int(os.environ.get('DELETION_WORKERS', 1))
+
+# Uploads above this size are streamed to a temporary file, not memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024
+# Limits of uploaded images, checked on the header before decoding, and
+# the quality they are re-encoded with, see posts.images.
+IMAGE_UPLOAD_MAX_BYTES = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_UPLOAD_MAX_PIXELS = int(
+    os.environ.get('IMAGE_UPLOAD_MAX_PIXELS', 40 * 1000 * 1000))
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+
+# Media files are stored once per distinct content and reference counted,
+# see posts.storage. sorl names thumbnails by their source already, they
+# are kept in a plain storage.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Thumbnail URLs of avatars uploaded before the srcset variants are cached
+# by avatar for this many seconds, so a comment list or an admin page
+# resolves its avatars in one round trip.
+AVATAR_CACHE_TIMEOUT = int(os.environ.get('AVATAR_CACHE_TIMEOUT', 24 * 60 * 60))
+
+# Compiled templates are kept by every worker outside dev, so the includes
+# of the feed loops are parsed once per process instead of per request.
+# Django only does this by itself while DEBUG is off, TEMPLATE_CACHE makes
+# it a switch of its own. manage.py render_benchmark compares both modes.
+TEMPLATE_CACHE = bool(strtobool(os.environ.get(
+    'TEMPLATE_CACHE', str(SETTINGS_PROFILE != 'dev'))))
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = (
+    [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+    if TEMPLATE_CACHE else TEMPLATE_LOADERS)
@@ -3,6 +3,7 @@ from django.conf.urls import handler400, handler500
 from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path
+from posts.instrumentation import metrics_view
 
 handler400 = "posts.views.page_not_found"
 handler500 = "posts.views.server_error"
@@ -12,16 +13,18 @@ urlpatterns = [
     path('about/', include('about.urls', namespace='about')),
     path("auth/", include("users.urls")),
     path("auth/", include("django.contrib.auth.urls")),
+    path("api/v1/", include("api.urls", namespace="api")),
+    path("metrics", metrics_view, name="metrics"),
     path("", include("posts.urls")),
 ]
 
-if settings.DEBUG:
+if settings.SERVE_FILES:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
-if settings.DEBUG:
+if 'debug_toolbar' in settings.INSTALLED_APPS:
     import debug_toolbar
 
     urlpatterns += (path("__debug__/", include(debug_toolbar.urls)),)